@@ -0,0 +1,88 @@
+"""
+Benchmark the search index backends: recall@k and latency of the IVF
+(approximate) index against exact flat search.
+
+    python bench_search.py --rows 1000000 --dim 384 --k 10 --nprobe 4 8 16 32 64
+
+Uses synthetic clustered unit vectors, which behave much like sentence
+embeddings of a transcript library (many near-duplicate topics).
+Pass --index DIR to benchmark the vectors of an existing search index instead.
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from services.vector_index import VectorIndex, IVFIndex
+
+def synthetic_vectors(rows: int, dim: int, topics: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((topics, dim)).astype(np.float32)
+    vectors = np.empty((rows, dim), dtype=np.float32)
+    for start in range(0, rows, 100000):
+        n = min(100000, rows - start)
+        topic = rng.integers(0, topics, n)
+        vectors[start:start + n] = centers[topic] + 1.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+def timed_search(index: VectorIndex, queries: np.ndarray, k: int):
+    results, latencies = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        hits = index.search(q, k)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        results.append({segment_id for segment_id, _ in hits})
+    return results, np.array(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--topics", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32, 64])
+    parser.add_argument("--index", help="Directory of an existing search index to take vectors from")
+    args = parser.parse_args()
+
+    if args.index:
+        source = VectorIndex(args.index)
+        live = source._ids >= 0
+        vectors = np.asarray(source._vectors[live])
+        print(f"Loaded {len(vectors)} vectors from {args.index}")
+    else:
+        print(f"Generating {args.rows} x {args.dim} vectors...")
+        vectors = synthetic_vectors(args.rows, args.dim, args.topics)
+
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), args.queries, replace=False)]
+    queries = queries + 0.3 * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(vectors.shape[1])
+    ids = np.arange(len(vectors))
+    projects = np.zeros(len(vectors), dtype=np.int64)
+
+    workdir = tempfile.mkdtemp(prefix="bench_search_")
+    try:
+        flat = VectorIndex(f"{workdir}/flat")
+        flat.add(ids, projects, vectors, "bench")
+        exact, latencies = timed_search(flat, queries, args.k)
+        print(f"\n{'index':<16}{'recall@' + str(args.k):>12}{'mean ms':>10}{'p95 ms':>10}")
+        print(f"{'flat (exact)':<16}{1.0:>12.3f}{latencies.mean():>10.2f}{np.percentile(latencies, 95):>10.2f}")
+
+        t0 = time.perf_counter()
+        ivf = IVFIndex(f"{workdir}/ivf", min_train_rows=len(vectors))
+        ivf.add(ids, projects, vectors, "bench")
+        print(f"(IVF build: {len(ivf._centroids)} lists in {time.perf_counter() - t0:.1f}s)")
+
+        for nprobe in args.nprobe:
+            ivf.nprobe = nprobe
+            approx, latencies = timed_search(ivf, queries, args.k)
+            recall = np.mean([len(a & e) / len(e) for a, e in zip(approx, exact) if e])
+            print(f"{'ivf nprobe=' + str(nprobe):<16}{recall:>12.3f}{latencies.mean():>10.2f}{np.percentile(latencies, 95):>10.2f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark segment translation throughput: the old one-call-per-segment
+loop against the batched, pooled translate_segments.
+
+    python bench_translate.py --from en --to es --segments 500
+    python bench_translate.py --project 3 --to de    # use a real transcript
+
+Needs the argos package for the language pair installed (see
+translator.install_languages).
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from services import translator
+
+SAMPLE_SENTENCES = [
+    "Welcome back to the channel, today we are looking at something a little different.",
+    "If you enjoyed this video, please like and subscribe.",
+    "The first thing you need to understand is how the memory hierarchy works.",
+    "So let's go ahead and open up the terminal.",
+    "This is where most people make a mistake.",
+    "We'll come back to that point in a minute.",
+    "As you can see on the screen, the numbers speak for themselves.",
+    "Thanks for watching and I'll see you in the next one.",
+]
+
+def synthetic_segments(count: int):
+    rng = random.Random(0)
+    segments = []
+    for i in range(count):
+        text = " ".join(rng.sample(SAMPLE_SENTENCES, rng.randint(1, 2)))
+        segments.append({"start": i * 4.0, "end": i * 4.0 + 3.8, "text": text})
+    return segments
+
+async def project_segments(project_id: int):
+    from sqlalchemy import select
+    from database import AsyncSessionLocal
+    from models import Transcript
+    from transcript_store import load_segments
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Transcript).where(Transcript.project_id == project_id).order_by(Transcript.id.desc()).limit(1)
+        )
+        transcript = result.scalar_one()
+        return await load_segments(db, transcript.id), transcript.language or "en"
+
+def sequential(segments, source, target):
+    """The original implementation: one translate() call per segment."""
+    return [{**seg, "text": translator.translate_text(seg["text"], source, target)} for seg in segments]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from", dest="source", default="en")
+    parser.add_argument("--to", dest="target", default="es")
+    parser.add_argument("--segments", type=int, default=300)
+    parser.add_argument("--project", type=int, help="Translate this project's transcript instead of sample text")
+    args = parser.parse_args()
+
+    if args.project:
+        segments, args.source = asyncio.run(project_segments(args.project))
+    else:
+        segments = synthetic_segments(args.segments)
+    print(f"{len(segments)} segments, {args.source} -> {args.target}, "
+          f"batch size {translator.TRANSLATE_BATCH_SIZE}, {translator.TRANSLATE_WORKERS} workers")
+
+    # Load the models once so neither run pays for it
+    translator.translate_text("warm up", args.source, args.target)
+    translator.translate_segments(segments[:1], args.target, args.source)
+
+    t0 = time.perf_counter()
+    before = sequential(segments, args.source, args.target)
+    seq_time = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    after = translator.translate_segments(segments, args.target, args.source)
+    batch_time = time.perf_counter() - t0
+
+    assert [(s["start"], s["end"]) for s in after] == [(s["start"], s["end"]) for s in segments]
+    same = sum(a["text"] == b["text"] for a, b in zip(before, after))
+
+    print(f"\n{'path':<12}{'seconds':>10}{'segments/s':>12}")
+    print(f"{'sequential':<12}{seq_time:>10.2f}{len(segments) / seq_time:>12.1f}")
+    print(f"{'batched':<12}{batch_time:>10.2f}{len(segments) / batch_time:>12.1f}")
+    print(f"\nSpeedup: {seq_time / batch_time:.1f}x, identical output for {same}/{len(segments)} segments")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
 from models import Base
+import logging
+
+logger = logging.getLogger(__name__)
 
 DATABASE_URL = "sqlite+aiosqlite:///./yt_pro.db"
 
@@ -10,9 +15,74 @@ AsyncSessionLocal = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
 
+def _add_missing_columns(conn):
+    """
+    create_all() only creates missing tables; add columns introduced since a
+    table was created so existing databases keep working.
+    """
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {col["name"] for col in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            col_type = column.type.compile(dialect=conn.dialect)
+            default = ""
+            if column.default is not None and column.default.is_scalar:
+                arg = column.default.arg
+                if isinstance(arg, str):
+                    default = f" DEFAULT '{getattr(arg, 'value', arg)}'"
+                elif isinstance(arg, (int, float)):
+                    default = f" DEFAULT {int(arg) if isinstance(arg, bool) else arg}"
+            conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {col_type}{default}'))
+
+# Full-text index over segments.text, kept in sync by triggers. External
+# content: the index stores only the inverted lists, rows come from `segments`.
+FTS_DDL = [
+    """CREATE VIRTUAL TABLE segments_fts USING fts5(
+        text, content='segments', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS segments_fts_insert AFTER INSERT ON segments BEGIN
+        INSERT INTO segments_fts(rowid, text) VALUES (new.id, new.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS segments_fts_delete AFTER DELETE ON segments BEGIN
+        INSERT INTO segments_fts(segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS segments_fts_update AFTER UPDATE OF text ON segments BEGIN
+        INSERT INTO segments_fts(segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO segments_fts(rowid, text) VALUES (new.id, new.text);
+    END""",
+]
+
+# Set by init_db(); False when SQLite was built without FTS5
+fts_enabled = False
+
+def _create_fts_index(conn) -> bool:
+    if inspect(conn).has_table("segments_fts"):
+        return True
+    try:
+        for statement in FTS_DDL:
+            conn.execute(text(statement))
+    except OperationalError as e:
+        logger.warning(f"SQLite FTS5 unavailable, keyword search will scan transcripts: {e}")
+        return False
+    # Index segments written before the table existed
+    conn.execute(text("INSERT INTO segments_fts(segments_fts) VALUES ('rebuild')"))
+    return True
+
+def fts_available() -> bool:
+    return fts_enabled
+
 async def init_db():
+    global fts_enabled
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
+    async with engine.begin() as conn:
+        fts_enabled = await conn.run_sync(_create_fts_index)
 
 async def get_db():
     async with AsyncSessionLocal() as session:
@@ -1,26 +1,46 @@
-from fastapi import FastAPI, HTTPException, Depends, Response, UploadFile, File
+from fastapi import FastAPI, HTTPException, Depends, Response, UploadFile, File, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from typing import List, Optional
-import threading
+from datetime import datetime
 import asyncio
+import hashlib
+import json
 import logging
-import traceback
+import time
 import os
+import re
 import shutil
 import uuid
 
-from database import init_db, get_db, AsyncSessionLocal
-from models import Project, Transcript, ProjectStatus
-from services.downloader import download_audio
-from services.transcriber import transcriber
+from database import init_db, get_db, AsyncSessionLocal, fts_available
+from models import Project, Transcript, MediaAsset, ProjectStatus, Job, JobStage, JobStatus
+from scheduler import scheduler
+from media_store import (
+    source_lock, find_asset, attach_asset, release_asset, store_upload, adopt_legacy_media, project_audio_sha256,
+)
+from transcript_store import (
+    get_segments, load_segments, save_segments, delete_transcript, set_speakers, touch_transcript,
+    transcription_cache_key, get_cached_transcription, store_cached_transcription,
+    get_cached_diarization, store_cached_diarization, get_translation_memory, store_translation_memory,
+    migrate_legacy_transcripts, embed_transcript, backfill_search_index, load_search_hits,
+    search_filter_clauses, filtered_segment_ids, load_filtered_segments, keyword_search_hits,
+)
+from services.events import transcription_events
+from services.downloader import download_audio, resolve_source_key
+from services.transcriber import transcriber, validate_model, MODEL_SIZE, COMPUTE_TYPE, BEAM_SIZE
 from services import exporter, translator
 from services.diarizer import diarize_audio, merge_segments_with_speakers
-from services.search_service import search_transcripts
-from services.clip_service import create_social_clips, extract_clip
+from services.search_service import (
+    search_index, remove_from_index, keyword_search, reciprocal_rank_fusion, encode_cursor, decode_cursor,
+)
+from services.transcript_cache import transcript_cache
+from services.export_cache import export_cache
+from services.zip_stream import ZipStream
+from services.clip_service import ASPECT_RATIOS, render_social_clips
 
 # Configure logging
 logging.basicConfig(
@@ -47,6 +67,11 @@ app.add_middleware(
 # Pydantic Models
 class ProjectCreate(BaseModel):
     url: str
+    priority: int = 0
+    model_size: Optional[str] = None # tiny, base, small, ...
+    compute_type: Optional[str] = None # int8, float16, ...
+    language: Optional[str] = None # e.g. "en"; detected when omitted
+    force_refresh: bool = False # ignore cached transcriptions of the same audio
 
 class ProjectResponse(BaseModel):
     id: int
@@ -58,75 +83,370 @@ class ProjectResponse(BaseModel):
     class Config:
         from_attributes = True
 
-# Background Processing
-def process_project_thread(project_id: int):
-    logger.info(f"[THREAD] Started for project {project_id}")
-    try:
-        asyncio.run(process_project_async(project_id))
-    except Exception as e:
-        logger.error(f"[THREAD] Error: {e}")
-        logger.error(traceback.format_exc())
+class JobResponse(BaseModel):
+    id: int
+    project_id: int
+    stage: str
+    status: str
+    priority: int
+    progress: Optional[float]
+    result: Optional[dict] = None
+    error: Optional[str]
+    attempts: int
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
 
-async def process_project_async(project_id: int):
+    @field_validator("result", mode="before")
+    @classmethod
+    def parse_result(cls, value):
+        return json.loads(value) if isinstance(value, str) else value
+
+    class Config:
+        from_attributes = True
+
+# Background Processing (run by the job scheduler)
+async def run_download_job(job: Job, payload: dict):
+    project_id = job.project_id
     logger.info(f"[BG] Processing project {project_id}")
-    
+
     async with AsyncSessionLocal() as db:
-        try:
-            result = await db.execute(select(Project).where(Project.id == project_id))
-            project = result.scalar_one_or_none()
-            if not project:
-                logger.error(f"[BG] Project {project_id} not found!")
-                return
-                
-            project.status = ProjectStatus.DOWNLOADING
-            await db.commit()
-            logger.info(f"[BG] Downloading {project.url}...")
-            
-            metadata = await download_audio(project.url, project_id)
-            logger.info(f"[BG] Downloaded: {metadata.get('title')}")
-            
+        result = await db.execute(select(Project).where(Project.id == project_id))
+        project = result.scalar_one_or_none()
+        if not project:
+            raise Exception(f"Project {project_id} not found")
+
+        project.status = ProjectStatus.DOWNLOADING
+        await db.commit()
+
+        loop = asyncio.get_event_loop()
+        source_key = await loop.run_in_executor(None, resolve_source_key, project.url)
+
+        async with source_lock(source_key or project.url):
+            asset = await find_asset(db, source_key=source_key) if source_key else None
+            if asset:
+                logger.info(f"[BG] Reusing stored {source_key} at {asset.path}")
+            else:
+                logger.info(f"[BG] Downloading {project.url}...")
+                metadata = await download_audio(project.url)
+                logger.info(f"[BG] Downloaded: {metadata.get('title')}")
+
+                # The URL may not have been recognisable offline; yt-dlp's key is authoritative
+                asset = await find_asset(db, source_key=metadata["source_key"])
+                if asset is None:
+                    asset = MediaAsset(
+                        source_key=metadata["source_key"],
+                        sha256=metadata["sha256"],
+                        path=metadata["file_path"],
+                        size_bytes=metadata["size_bytes"],
+                        title=metadata.get("title"),
+                        duration=metadata.get("duration"),
+                        thumbnail_url=metadata.get("thumbnail"),
+                    )
+                    db.add(asset)
+                    await db.flush()
+
             result = await db.execute(select(Project).where(Project.id == project_id))
             project = result.scalar_one_or_none()
-            project.title = metadata.get("title")
-            project.duration = metadata.get("duration")
-            project.thumbnail_url = metadata.get("thumbnail")
-            project.audio_path = metadata.get("file_path")
+            project.title = asset.title
+            project.duration = asset.duration
+            project.thumbnail_url = asset.thumbnail_url
+            attach_asset(project, asset)
             project.status = ProjectStatus.PROCESSING
             await db.commit()
-            
+
+    await scheduler.enqueue(project_id, JobStage.TRANSCRIBE, payload=payload, priority=job.priority)
+    return {"title": asset.title, "file_path": asset.path, "media_asset_id": asset.id}
+
+# Streamed segments are written to the DB in batches of this many, or this often
+TRANSCRIPT_FLUSH_SEGMENTS = 25
+TRANSCRIPT_FLUSH_SECONDS = 2.0
+
+async def _replay_cached(cached: dict):
+    """Feed a cached transcription through the same path as a live one."""
+    yield "info", {
+        "language": cached["language"],
+        "language_probability": cached["language_probability"],
+        "duration": cached["duration"],
+    }
+    for seg in cached["segments"]:
+        yield "segment", seg
+
+async def run_transcribe_job(job: Job, payload: dict):
+    project_id = job.project_id
+    force_refresh = payload.get("force_refresh", False)
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Project).where(Project.id == project_id))
+        project = result.scalar_one_or_none()
+        if not project:
+            raise Exception(f"Project {project_id} not found")
+
+        # Drop partial output left by an interrupted earlier run
+        result = await db.execute(
+            select(Transcript.id).where(Transcript.project_id == project_id, Transcript.is_complete.is_(False))
+        )
+        for (stale_id,) in result.all():
+            await delete_transcript(db, stale_id)
+
+        transcript = Transcript(project_id=project_id, is_complete=False)
+        db.add(transcript)
+        project.status = ProjectStatus.PROCESSING
+        await db.commit()
+
+        # Identical audio + settings transcribed before? Reuse it unless asked not to
+        audio_sha256 = await project_audio_sha256(db, project)
+        cache_key = transcription_cache_key(
+            audio_sha256,
+            project.model_size or MODEL_SIZE,
+            project.compute_type or COMPUTE_TYPE,
+            BEAM_SIZE,
+            project.language,
+        )
+        cached = None if force_refresh else await get_cached_transcription(db, cache_key)
+
+        duration = project.duration
+        transcription_events.start(project_id)
+        if cached:
+            logger.info(f"[BG] Using cached transcription for {project.audio_path}")
+            stream = _replay_cached(cached)
+        else:
             logger.info(f"[BG] Transcribing {project.audio_path}...")
-            transcript_result = await transcriber.transcribe(project.audio_path)
-            logger.info(f"[BG] Transcribed {len(transcript_result['segments'])} segments")
-            
-            result = await db.execute(select(Project).where(Project.id == project_id))
-            project = result.scalar_one_or_none()
-            
-            new_transcript = Transcript(
-                project_id=project.id,
-                language=transcript_result["language"],
-                content=str(transcript_result["segments"])
+            stream = transcriber.transcribe_stream(
+                project.audio_path,
+                model_size=project.model_size,
+                compute_type=project.compute_type,
+                language=project.language,
             )
-            db.add(new_transcript)
-            project.status = ProjectStatus.COMPLETED
+
+        info = {}
+        collected = []
+        buffer = []
+        saved = 0
+        saved_end = 0.0
+        last_flush = time.monotonic()
+
+        async def flush():
+            nonlocal saved, last_flush
+            last_flush = time.monotonic()
+            if not buffer:
+                return
+            await save_segments(db, transcript.id, buffer, first_position=saved)
+            await touch_transcript(db, transcript.id)
             await db.commit()
-            
-            logger.info(f"[BG] ✅ Project {project_id} COMPLETED!")
-            
-        except Exception as e:
-            logger.error(f"[BG] ❌ Error processing project {project_id}: {e}")
-            logger.error(traceback.format_exc())
-            try:
-                result = await db.execute(select(Project).where(Project.id == project_id))
-                project = result.scalar_one_or_none()
-                if project:
-                    project.status = ProjectStatus.FAILED
-                    await db.commit()
-            except Exception as db_e:
-                logger.error(f"[BG] Failed to update status to FAILED: {db_e}")
+            saved += len(buffer)
+            buffer.clear()
+            if duration:
+                await scheduler.set_progress(job.id, min(1.0, saved_end / duration))
+
+        async for kind, data in stream:
+            if kind == "info":
+                info = data
+                transcript.language = data["language"]
+                if not duration:
+                    duration = data["duration"]
+                    project.duration = duration
+                await db.commit()
+                transcription_events.publish(project_id, {"event": "info", **data})
+                continue
+
+            index = saved + len(buffer)
+            buffer.append(data)
+            if not cached:
+                collected.append(data)
+            saved_end = data["end"]
+            transcription_events.publish(project_id, {
+                "event": "segment",
+                "index": index,
+                **data,
+                "progress": min(1.0, data["end"] / duration) if duration else None,
+            })
+            # Cached results are written in one go at the end
+            if not cached and (
+                len(buffer) >= TRANSCRIPT_FLUSH_SEGMENTS or time.monotonic() - last_flush >= TRANSCRIPT_FLUSH_SECONDS
+            ):
+                await flush()
+
+        await flush()
+        logger.info(f"[BG] Transcribed {saved} segments")
+
+        if not cached:
+            await store_cached_transcription(db, cache_key, info, collected)
+
+        # A re-transcription replaces the project's earlier transcripts
+        result = await db.execute(
+            select(Transcript.id).where(Transcript.project_id == project_id, Transcript.id != transcript.id)
+        )
+        for (old_id,) in result.all():
+            await delete_transcript(db, old_id)
+
+        # Audio diarized before: label the new segments from the stored speaker turns
+        turns = await get_cached_diarization(db, audio_sha256)
+        if turns:
+            segments = await load_segments(db, transcript.id)
+            await set_speakers(db, transcript.id, merge_segments_with_speakers(segments, turns))
+            logger.info(f"[BG] Re-applied cached speaker turns to project {project_id}")
+
+        transcript.is_complete = True
+        project.status = ProjectStatus.COMPLETED
+        await db.commit()
+        language = transcript.language
+
+    transcription_events.finish(project_id, {"event": "done", "segments": saved, "progress": 1.0})
+    logger.info(f"[BG] ✅ Project {project_id} COMPLETED!")
+
+    # Embed once at ingest so /search never encodes transcripts at query time
+    try:
+        async with AsyncSessionLocal() as db:
+            await embed_transcript(db, transcript)
+    except Exception as e:
+        logger.warning(f"[BG] Failed to index transcript {transcript.id} for search: {e}")
+    return {"segments": saved, "language": language, "cached": bool(cached)}
+
+async def mark_project_failed(job: Job, error: Exception):
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Project).where(Project.id == job.project_id))
+        project = result.scalar_one_or_none()
+        if project:
+            project.status = ProjectStatus.FAILED
+            await db.commit()
+    if transcription_events.is_running(job.project_id):
+        transcription_events.finish(job.project_id, {"event": "error", "detail": str(error)})
+
+async def run_diarize_job(job: Job, payload: dict):
+    """Label a project's latest transcript with speakers, running pyannote only for unseen audio."""
+    project_id = job.project_id
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Project).where(Project.id == project_id))
+        project = result.scalar_one_or_none()
+        if not project:
+            raise Exception(f"Project {project_id} not found")
+
+        audio_sha256 = await project_audio_sha256(db, project)
+        turns = None if payload.get("force_refresh") else await get_cached_diarization(db, audio_sha256)
+        cached = turns is not None
+        if not cached:
+            logger.info(f"[BG] Running diarization on project {project_id}...")
+            turns = await asyncio.get_event_loop().run_in_executor(None, diarize_audio, project.audio_path)
+            if not turns:
+                return {"speakers": 0, "message": "Diarization unavailable or no speakers detected"}
+            await store_cached_diarization(db, audio_sha256, turns)
+            await db.commit()
+        await scheduler.set_progress(job.id, 0.9)
+
+        result = await db.execute(
+            select(Transcript)
+            .where(
+                Transcript.project_id == project_id,
+                Transcript.is_complete.is_(True),
+                Transcript.source_transcript_id.is_(None),
+            )
+            .order_by(Transcript.id.desc())
+            .limit(1)
+        )
+        transcript = result.scalar_one_or_none()
+        if not transcript:
+            raise Exception("No transcript found. Transcribe first.")
+
+        segments = await load_segments(db, transcript.id)
+        merged_segments = merge_segments_with_speakers(segments, turns)
+        await set_speakers(db, transcript.id, merged_segments)
+        await db.commit()
+
+    num_speakers = len(set(s.get('speaker', '') for s in merged_segments if s.get('speaker')))
+    logger.info(f"[BG] Diarization complete: {num_speakers} speakers identified")
+    return {"speakers": num_speakers, "segments_updated": len(merged_segments), "cached": cached}
+
+async def run_clip_job(job: Job, payload: dict):
+    """Render social clips for a project's highlights, reporting progress per clip."""
+    project_id = job.project_id
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Project).where(Project.id == project_id))
+        project = result.scalar_one_or_none()
+        if not project:
+            raise Exception(f"Project {project_id} not found")
+
+        result = await db.execute(select(Transcript).where(Transcript.project_id == project_id, Transcript.source_transcript_id.is_(None)))
+        transcript = result.scalars().first()
+        if not transcript:
+            raise Exception("No transcript found. Transcribe first.")
+        segments = await get_segments(db, transcript)
+
+    count = payload.get("count", 3)
+    progress = [0.0] * count
+
+    def on_progress(index: int, fraction: float):
+        progress[index] = fraction
+
+    render = asyncio.ensure_future(render_social_clips(
+        video_path=project.audio_path,
+        segments=segments,
+        output_dir=f"downloads/{project_id}/clips",
+        clip_count=count,
+        clip_duration=payload.get("duration", 30),
+        aspect_ratios=payload.get("aspect_ratios", ["9:16", "1:1"]),
+        on_progress=on_progress,
+        smart_cut=payload.get("smart_cut", False),
+    ))
+    try:
+        # Publish progress once a second while ffmpeg runs
+        while not render.done():
+            await asyncio.wait({render}, timeout=1.0)
+            if not render.done():
+                await scheduler.set_progress(job.id, sum(progress) / count, {"clip_progress": progress})
+        clips = render.result()
+    finally:
+        if not render.done():
+            # Job cancelled: render_social_clips returns once every ffmpeg is killed and partial files removed
+            render.cancel()
+            await asyncio.gather(render, return_exceptions=True)
+
+    logger.info(f"[BG] Rendered {len(clips)} clips for project {project_id}")
+    return {"clips_generated": len(clips), "clips": clips}
+
+scheduler.register(JobStage.DOWNLOAD, run_download_job, on_failure=mark_project_failed)
+scheduler.register(JobStage.TRANSCRIBE, run_transcribe_job, on_failure=mark_project_failed)
+scheduler.register(JobStage.DIARIZE, run_diarize_job)
+scheduler.register(JobStage.CLIP, run_clip_job, cancellable=True)
+
+async def requeue_orphaned_projects():
+    """
+    Queue work for projects stuck mid-pipeline without an active job
+    (e.g. created before the job table existed).
+    """
+    async with AsyncSessionLocal() as db:
+        active = select(Job.project_id).where(Job.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]))
+        result = await db.execute(
+            select(Project).where(
+                Project.status.in_([ProjectStatus.CREATED, ProjectStatus.DOWNLOADING, ProjectStatus.PROCESSING]),
+                Project.id.not_in(active),
+            )
+        )
+        orphans = result.scalars().all()
+
+    for project in orphans:
+        if project.audio_path and os.path.exists(project.audio_path):
+            stage = JobStage.TRANSCRIBE
+        else:
+            stage = JobStage.DOWNLOAD
+        logger.info(f"[BG] Re-queueing orphaned project {project.id} at {stage.value}")
+        await scheduler.enqueue(project.id, stage)
 
 @app.on_event("startup")
 async def on_startup():
     await init_db()
+    await migrate_legacy_transcripts()
+    await adopt_legacy_media()
+    # Warm the configured Whisper models without holding up startup
+    asyncio.get_event_loop().run_in_executor(None, transcriber.preload)
+    await scheduler.start()
+    await requeue_orphaned_projects()
+    asyncio.create_task(backfill_search_index())
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await scheduler.stop()
+    transcriber.shutdown()
 
 @app.get("/health")
 def health_check():
@@ -134,21 +454,48 @@ def health_check():
 
 @app.post("/projects", response_model=ProjectResponse)
 async def create_project(project_in: ProjectCreate, db: AsyncSession = Depends(get_db)):
-    new_project = Project(url=project_in.url, status=ProjectStatus.CREATED)
+    try:
+        validate_model(project_in.model_size, project_in.compute_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    new_project = Project(
+        url=project_in.url,
+        status=ProjectStatus.CREATED,
+        model_size=project_in.model_size,
+        compute_type=project_in.compute_type,
+        language=project_in.language,
+    )
     db.add(new_project)
     await db.commit()
     await db.refresh(new_project)
     
-    logger.info(f"[API] Created project {new_project.id}, starting thread...")
-    thread = threading.Thread(target=process_project_thread, args=(new_project.id,))
-    thread.daemon = True
-    thread.start()
+    logger.info(f"[API] Created project {new_project.id}, queueing download...")
+    await scheduler.enqueue(
+        new_project.id,
+        JobStage.DOWNLOAD,
+        payload={"force_refresh": project_in.force_refresh},
+        priority=project_in.priority,
+    )
     
     return new_project
 
 @app.post("/projects/upload")
-async def upload_local_file(file: UploadFile = File(...), db: AsyncSession = Depends(get_db)):
+async def upload_local_file(
+    file: UploadFile = File(...),
+    priority: int = 0,
+    model_size: Optional[str] = None,
+    compute_type: Optional[str] = None,
+    language: Optional[str] = None,
+    force_refresh: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
     """Upload a local audio/video file for transcription."""
+    try:
+        validate_model(model_size, compute_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     # Validate file extension
     allowed_extensions = ['.mp4', '.mkv', '.mp3', '.wav', '.webm', '.m4a', '.ogg']
     file_ext = os.path.splitext(file.filename)[1].lower()
@@ -156,73 +503,57 @@ async def upload_local_file(file: UploadFile = File(...), db: AsyncSession = Dep
         raise HTTPException(status_code=400, detail=f"Invalid file type. Allowed: {allowed_extensions}")
     
     # Create project
-    new_project = Project(url=f"local://{file.filename}", status=ProjectStatus.CREATED, title=file.filename)
+    new_project = Project(
+        url=f"local://{file.filename}",
+        status=ProjectStatus.CREATED,
+        title=file.filename,
+        model_size=model_size,
+        compute_type=compute_type,
+        language=language,
+    )
     db.add(new_project)
     await db.commit()
     await db.refresh(new_project)
     
-    # Save file to disk
-    project_dir = f"downloads/{new_project.id}"
-    os.makedirs(project_dir, exist_ok=True)
-    file_path = os.path.join(project_dir, f"audio{file_ext}")
-    
-    with open(file_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
-    
-    logger.info(f"[API] Saved uploaded file to {file_path}")
+    # Save file to disk (deduplicated by content hash)
+    asset = await store_upload(db, file, file_ext)
+    logger.info(f"[API] Stored uploaded file at {asset.path}")
     
     # Update project with file path
     result = await db.execute(select(Project).where(Project.id == new_project.id))
     project = result.scalar_one()
-    project.audio_path = file_path
+    attach_asset(project, asset)
     project.status = ProjectStatus.PROCESSING
     await db.commit()
     
-    # Start transcription in background
-    def process_upload(proj_id: int, audio_path: str):
-        asyncio.run(_process_uploaded_file(proj_id, audio_path))
-    
-    thread = threading.Thread(target=process_upload, args=(new_project.id, file_path))
-    thread.daemon = True
-    thread.start()
+    # Queue transcription
+    await scheduler.enqueue(
+        new_project.id,
+        JobStage.TRANSCRIBE,
+        payload={"force_refresh": force_refresh},
+        priority=priority,
+    )
     
-    return {"id": new_project.id, "status": "processing", "message": "File uploaded, transcription started"}
+    return {"id": new_project.id, "status": "processing", "message": "File uploaded, transcription queued"}
 
-async def _process_uploaded_file(project_id: int, audio_path: str):
-    """Process an uploaded file (transcribe only, no download needed)."""
-    async with AsyncSessionLocal() as db:
-        try:
-            logger.info(f"[UPLOAD] Transcribing {audio_path}...")
-            transcript_result = await transcriber.transcribe(audio_path)
-            logger.info(f"[UPLOAD] Transcribed {len(transcript_result['segments'])} segments")
-            
-            result = await db.execute(select(Project).where(Project.id == project_id))
-            project = result.scalar_one_or_none()
-            if not project:
-                return
-            
-            new_transcript = Transcript(
-                project_id=project.id,
-                language=transcript_result["language"],
-                content=str(transcript_result["segments"])
-            )
-            db.add(new_transcript)
-            project.status = ProjectStatus.COMPLETED
-            await db.commit()
-            
-            logger.info(f"[UPLOAD] ✅ Project {project_id} COMPLETED!")
-        except Exception as e:
-            logger.error(f"[UPLOAD] ❌ Error: {e}")
-            result = await db.execute(select(Project).where(Project.id == project_id))
-            project = result.scalar_one_or_none()
-            if project:
-                project.status = ProjectStatus.FAILED
-                await db.commit()
+@app.post("/projects/{project_id}/transcribe")
+async def retranscribe_project(project_id: int, force_refresh: bool = False, priority: int = 0, db: AsyncSession = Depends(get_db)):
+    """Queue a new transcription of a project's audio. Served from the cache unless force_refresh."""
+    result = await db.execute(select(Project).where(Project.id == project_id))
+    project = result.scalar_one_or_none()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if not project.audio_path or not os.path.exists(project.audio_path):
+        raise HTTPException(status_code=400, detail="No audio file available for transcription")
+    
+    project.status = ProjectStatus.PROCESSING
+    await db.commit()
+    job = await scheduler.enqueue(project_id, JobStage.TRANSCRIBE, payload={"force_refresh": force_refresh}, priority=priority)
+    return {"job_id": job.id, "status": "queued"}
 
 @app.post("/projects/{project_id}/diarize")
-async def run_diarization(project_id: int, db: AsyncSession = Depends(get_db)):
-    """Run speaker diarization on a project's audio and update transcript with speaker labels."""
+async def run_diarization(project_id: int, force_refresh: bool = False, priority: int = 0, db: AsyncSession = Depends(get_db)):
+    """Queue speaker diarization of a project's audio; poll GET /jobs/{job_id} for the result."""
     result = await db.execute(select(Project).where(Project.id == project_id))
     project = result.scalar_one_or_none()
     if not project:
@@ -232,36 +563,21 @@ async def run_diarization(project_id: int, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=400, detail="No audio file available for diarization")
     
     # Get existing transcript
-    result = await db.execute(select(Transcript).where(Transcript.project_id == project_id))
-    transcript = result.scalar_one_or_none()
-    if not transcript:
+    result = await db.execute(
+        select(Transcript.id)
+        .where(
+            Transcript.project_id == project_id,
+            Transcript.is_complete.is_(True),
+            Transcript.source_transcript_id.is_(None),
+        )
+        .limit(1)
+    )
+    if result.scalar_one_or_none() is None:
         raise HTTPException(status_code=400, detail="No transcript found. Transcribe first.")
     
-    # Run diarization
-    logger.info(f"[API] Running diarization on project {project_id}...")
-    speaker_segments = diarize_audio(project.audio_path)
-    
-    if not speaker_segments:
-        return {"message": "Diarization unavailable or no speakers detected", "speakers": 0}
-    
-    # Parse existing transcript segments
-    import ast
-    try:
-        segments = ast.literal_eval(transcript.content)
-    except:
-        segments = []
-    
-    # Merge with speaker labels
-    merged_segments = merge_segments_with_speakers(segments, speaker_segments)
-    
-    # Update transcript
-    transcript.content = str(merged_segments)
-    await db.commit()
-    
-    num_speakers = len(set(s.get('speaker', '') for s in merged_segments if s.get('speaker')))
-    logger.info(f"[API] Diarization complete: {num_speakers} speakers identified")
-    
-    return {"message": "Diarization complete", "speakers": num_speakers, "segments_updated": len(merged_segments)}
+    job = await scheduler.enqueue(project_id, JobStage.DIARIZE, {"force_refresh": force_refresh}, priority=priority)
+    logger.info(f"[API] Queued diarization of project {project_id} as job {job.id}")
+    return {"message": "Diarization queued", "job_id": job.id}
 
 @app.get("/projects", response_model=List[ProjectResponse])
 async def list_projects(db: AsyncSession = Depends(get_db)):
@@ -276,6 +592,32 @@ async def get_project(project_id: int, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Project not found")
     return project
 
+@app.get("/jobs", response_model=List[JobResponse])
+async def list_jobs(project_id: Optional[int] = None, status: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    """List scheduler jobs, newest first."""
+    query = select(Job).order_by(Job.id.desc())
+    if project_id is not None:
+        query = query.where(Job.project_id == project_id)
+    if status:
+        query = query.where(Job.status == status)
+    result = await db.execute(query)
+    return result.scalars().all()
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: int, db: AsyncSession = Depends(get_db)):
+    result = await db.execute(select(Job).where(Job.id == job_id))
+    job = result.scalar_one_or_none()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: int):
+    """Cancel a job that is still queued, or a running clip job."""
+    if not await scheduler.cancel(job_id):
+        raise HTTPException(status_code=409, detail="Job is not queued or cannot be cancelled while running")
+    return {"message": "Job cancelled"}
+
 @app.delete("/projects/{project_id}")
 async def delete_project(project_id: int, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(Project).where(Project.id == project_id))
@@ -283,36 +625,44 @@ async def delete_project(project_id: int, db: AsyncSession = Depends(get_db)):
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    # Delete associated transcripts first
-    from sqlalchemy import delete as sql_delete
-    await db.execute(sql_delete(Transcript).where(Transcript.project_id == project_id))
+    # Delete associated transcripts (translations first) with their segments and cached renders
+    result = await db.execute(
+        select(Transcript.id).where(Transcript.project_id == project_id)
+        .order_by(Transcript.source_transcript_id.is_(None), Transcript.id)
+    )
+    for transcript_id in result.scalars().all():
+        await delete_transcript(db, transcript_id)
+    if project.media_asset_id:
+        await release_asset(db, project.media_asset_id)
+    # Removal can compact (rewrite) the index; keep it off the event loop
+    await asyncio.get_event_loop().run_in_executor(None, remove_from_index, None, project_id)
     await db.delete(project)
     await db.commit()
     
-    # Clean up any associated files
-    import shutil
-    project_dir = f"downloads/{project_id}"
-    if os.path.exists(project_dir):
-        try:
-            shutil.rmtree(project_dir)
-        except Exception as e:
-            logger.warning(f"Failed to delete project files: {e}")
+    # Clean up files generated for the project. Its media is shared through
+    # the media store and was released above (deleted once unreferenced).
+    for output_dir in (f"downloads/{project_id}/clips", f"downloads/project_{project_id}"):
+        if os.path.exists(output_dir):
+            try:
+                shutil.rmtree(output_dir)
+            except Exception as e:
+                logger.warning(f"Failed to delete project files: {e}")
+    try:
+        os.rmdir(f"downloads/{project_id}")  # only if nothing else is left in it
+    except OSError:
+        pass
     
     return {"message": "Project deleted successfully"}
 
 @app.get("/projects/{project_id}/transcript")
 async def get_transcript(project_id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Transcript).where(Transcript.project_id == project_id))
+    result = await db.execute(select(Transcript).where(Transcript.project_id == project_id, Transcript.source_transcript_id.is_(None)))
     transcripts = result.scalars().all()
     if not transcripts:
         raise HTTPException(status_code=404, detail="No transcript found")
     
     transcript = transcripts[-1]
-    import ast
-    try:
-        segments = ast.literal_eval(transcript.content)
-    except:
-        segments = []
+    segments = await get_segments(db, transcript)
     
     return {
         "id": transcript.id,
@@ -321,54 +671,244 @@ async def get_transcript(project_id: int, db: AsyncSession = Depends(get_db)):
         "created_at": transcript.created_at
     }
 
+def _sse(event: dict) -> str:
+    return f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+@app.get("/projects/{project_id}/transcript/stream")
+async def stream_transcript(project_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Server-sent events for a project's transcript: segments already decoded,
+    then each new segment as it is decoded, with progress, until done/error.
+    """
+    result = await db.execute(select(Project).where(Project.id == project_id))
+    if not result.scalar_one_or_none():
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    # Subscribe before checking the DB so nothing published in between is missed
+    history, queue = transcription_events.subscribe(project_id)
+
+    async def event_stream():
+        try:
+            if not history:
+                async with AsyncSessionLocal() as session:
+                    result = await session.execute(select(Project).where(Project.id == project_id))
+                    project = result.scalar_one_or_none()
+                    if project and project.status in (ProjectStatus.COMPLETED, ProjectStatus.FAILED):
+                        # Nothing running: replay what is stored and stop
+                        result = await session.execute(
+                            select(Transcript).where(Transcript.project_id == project_id, Transcript.source_transcript_id.is_(None)).order_by(Transcript.id.desc())
+                        )
+                        transcript = result.scalars().first()
+                        segments = await get_segments(session, transcript) if transcript else []
+                        for index, seg in enumerate(segments):
+                            yield _sse({"event": "segment", "index": index, **seg})
+                        if project.status == ProjectStatus.COMPLETED:
+                            yield _sse({"event": "done", "segments": len(segments), "progress": 1.0})
+                        else:
+                            yield _sse({"event": "error", "detail": "Transcription failed"})
+                        return
+
+            for event in history:
+                yield _sse(event)
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), 15)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse(event)
+                if event["event"] in ("done", "error"):
+                    return
+        finally:
+            transcription_events.unsubscribe(project_id, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.get("/projects/{project_id}/export")
-async def export_transcript(project_id: int, format: str = "txt", db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Transcript).where(Transcript.project_id == project_id))
+async def export_transcript(
+    project_id: int,
+    format: str = "txt",
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    if format not in exporter.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format. Available: {', '.join(exporter.FORMATS)}")
+
+    result = await db.execute(select(Transcript).where(Transcript.project_id == project_id, Transcript.source_transcript_id.is_(None)))
     transcript = result.scalars().first()
     if not transcript:
         raise HTTPException(status_code=404, detail="Transcript not found")
     
-    import ast
-    try:
-        segments = ast.literal_eval(transcript.content)
-    except:
-        segments = []
-    
-    if format == "srt":
-        content = exporter.to_srt(segments)
-        filename = f"transcript_{project_id}.srt"
-    elif format == "vtt":
-        content = exporter.to_vtt(segments)
-        filename = f"transcript_{project_id}.vtt"
+    _, media_type, extension = exporter.FORMATS[format]
+    version = transcript.version or 1
+    etag = export_cache.etag(transcript.id, transcript.created_at, version, format)
+    headers = {
+        "Content-Disposition": f"attachment; filename=transcript_{project_id}.{extension}",
+        "ETag": etag,
+        "Cache-Control": "no-cache",  # cacheable, but revalidate: the transcript can change
+    }
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    media_type = f"{media_type}; charset=utf-8"
+    cached = export_cache.get(transcript.id, transcript.created_at, version, format)
+    if cached:
+        return FileResponse(cached, media_type=media_type, headers=headers)
+
+    segments = await get_segments(db, transcript)
+    chunks = exporter.iter_export(segments, format)
+    if transcript.is_complete:
+        chunks = export_cache.write_through(chunks, transcript.id, transcript.created_at, version, format)
     else:
-        content = exporter.to_txt(segments)
-        filename = f"transcript_{project_id}.txt"
-        
-    return Response(
-        content=content,
-        media_type="text/plain",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+        headers.pop("ETag")  # still being written
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+class BulkExportRequest(BaseModel):
+    formats: List[str] = ["srt"]
+    project_ids: Optional[List[int]] = None # None = all projects
+    language: Optional[str] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+def _archive_folder(project_id: int, title: Optional[str]) -> str:
+    name = re.sub(r"[^\w\- ]+", "", title or "").strip()[:80]
+    return f"{project_id} - {name}" if name else str(project_id)
+
+@app.post("/exports")
+async def bulk_export(request: BulkExportRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Export the transcripts of many projects in one ZIP, one folder per
+    project and one file per format. The archive is streamed as it is built;
+    cached exports are reused and new ones cached as they are rendered.
+    """
+    unknown = [fmt for fmt in request.formats if fmt not in exporter.FORMATS]
+    if unknown or not request.formats:
+        raise HTTPException(status_code=400, detail=f"Unknown format. Available: {', '.join(exporter.FORMATS)}")
+    formats = list(dict.fromkeys(request.formats))
+
+    query = (
+        select(
+            Transcript.id, Transcript.created_at, Transcript.version, Transcript.is_complete, Transcript.updated_at,
+            Project.id, Project.title,
+        )
+        .join(Project, Project.id == Transcript.project_id)
+        .where(Transcript.source_transcript_id.is_(None))
+        .order_by(Project.id, Transcript.id)
     )
+    if request.project_ids is not None:
+        query = query.where(Project.id.in_(request.project_ids))
+    if request.language:
+        query = query.where(Transcript.language == request.language)
+    if request.created_after:
+        query = query.where(Project.created_at >= request.created_after)
+    if request.created_before:
+        query = query.where(Project.created_at < request.created_before)
+    # One transcript per project, the same one /export picks
+    rows = {}
+    for row in (await db.execute(query)).all():
+        rows.setdefault(row[5], row)
+    if not rows:
+        raise HTTPException(status_code=404, detail="No transcripts match")
+
+    async def archive_stream():
+        archive = ZipStream()
+        async with AsyncSessionLocal() as session:
+            for transcript_id, created_at, version, is_complete, updated_at, project_id, title in rows.values():
+                version = version or 1
+                folder = _archive_folder(project_id, title)
+                date_time = (updated_at or datetime.utcnow()).timetuple()[:6]
+                segments = None
+                for fmt in formats:
+                    cached = export_cache.get(transcript_id, created_at, version, fmt)
+                    if cached:
+                        chunks = export_cache.read(cached)
+                    else:
+                        if segments is None:
+                            segments = await load_segments(session, transcript_id)
+                        chunks = exporter.iter_export(segments, fmt)
+                        if is_complete:
+                            chunks = export_cache.write_through(chunks, transcript_id, created_at, version, fmt)
+                    name = f"{folder}/transcript_{project_id}.{exporter.FORMATS[fmt][2]}"
+                    for data in archive.add(name, chunks, date_time):
+                        yield data
+                        await asyncio.sleep(0)  # let other requests run between chunks
+        for data in archive.close():
+            yield data
+        logger.info(f"[API] Bulk export of {len(rows)} projects ({', '.join(formats)}) finished")
 
+    filename = f"transcripts_{datetime.utcnow():%Y%m%d_%H%M%S}.zip"
+    return StreamingResponse(
+        archive_stream(),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
 
 @app.post("/projects/{project_id}/translate")
 async def translate_project(project_id: int, target_lang: str = "es", db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Transcript).where(Transcript.project_id == project_id))
+    result = await db.execute(select(Transcript).where(Transcript.project_id == project_id, Transcript.source_transcript_id.is_(None)))
     transcript = result.scalars().first()
     if not transcript:
         raise HTTPException(status_code=404, detail="Transcript not found")
+    source_lang = transcript.language or "en"
+
+    # Translated before, from this version of the transcript? Serve it from the DB
+    result = await db.execute(
+        select(Transcript)
+        .where(Transcript.source_transcript_id == transcript.id, Transcript.language == target_lang)
+        .order_by(Transcript.id.desc())
+    )
+    previous = result.scalars().all()
+    if previous and previous[0].is_complete and previous[0].source_version == transcript.version:
+        return {
+            "original_language": source_lang,
+            "target_language": target_lang,
+            "segments": await get_segments(db, previous[0]),
+        }
     
-    import ast
-    try:
-        segments = ast.literal_eval(transcript.content)
-    except:
-        segments = []
+    segments = await get_segments(db, transcript)
     
+    # Sentences seen before (in any project) come from translation memory
     loop = asyncio.get_event_loop()
-    translated = await loop.run_in_executor(None, translator.translate_segments, segments, target_lang)
+    version = await loop.run_in_executor(None, translator.model_version, source_lang, target_lang)
+    sources = {translator.text_hash(seg['text']): seg['text'] for seg in segments if seg.get('text', '').strip()}
+    memory = await get_translation_memory(db, list(sources), source_lang, target_lang, version)
+    known = set(memory)
+
+    try:
+        translated = await loop.run_in_executor(
+            None, translator.translate_segments, segments, target_lang, source_lang, memory
+        )
+    except translator.TranslationError as e:
+        # Nothing is stored, so a later request (e.g. after installing the package) retries
+        raise HTTPException(status_code=500, detail=f"Translation failed: {e}")
+
+    await store_translation_memory(
+        db,
+        [(key, translator.normalize_text(sources[key]), memory[key]) for key in sources if key not in known],
+        source_lang, target_lang, version,
+    )
+    for old in previous:
+        await delete_transcript(db, old.id)
+    translation = Transcript(
+        project_id=project_id,
+        language=target_lang,
+        source_transcript_id=transcript.id,
+        source_version=transcript.version,
+        is_complete=True,
+    )
+    db.add(translation)
+    await db.flush()
+    await save_segments(db, translation.id, translated)
+    await db.commit()
+    logger.info(f"[API] Saved {target_lang} translation of project {project_id} ({len(sources) - len(known)} new sentences)")
     
     return {
-        "original_language": transcript.language,
+        "original_language": source_lang,
         "target_language": target_lang,
         "segments": translated
     }
@@ -380,16 +920,12 @@ async def summarize_project(project_id: int, style: str = "concise", db: AsyncSe
     """Generate AI summary of the transcript"""
     from services import llm_service
     
-    result = await db.execute(select(Transcript).where(Transcript.project_id == project_id))
+    result = await db.execute(select(Transcript).where(Transcript.project_id == project_id, Transcript.source_transcript_id.is_(None)))
     transcript = result.scalars().first()
     if not transcript:
         raise HTTPException(status_code=404, detail="Transcript not found")
     
-    import ast
-    try:
-        segments = ast.literal_eval(transcript.content)
-    except:
-        raise HTTPException(status_code=500, detail="Failed to parse transcript")
+    segments = await get_segments(db, transcript)
     
     return await llm_service.summarize(segments, style)
 
@@ -398,16 +934,12 @@ async def extract_key_points(project_id: int, count: int = 5, db: AsyncSession =
     """Extract key points from the transcript"""
     from services import llm_service
     
-    result = await db.execute(select(Transcript).where(Transcript.project_id == project_id))
+    result = await db.execute(select(Transcript).where(Transcript.project_id == project_id, Transcript.source_transcript_id.is_(None)))
     transcript = result.scalars().first()
     if not transcript:
         raise HTTPException(status_code=404, detail="Transcript not found")
     
-    import ast
-    try:
-        segments = ast.literal_eval(transcript.content)
-    except:
-        raise HTTPException(status_code=500, detail="Failed to parse transcript")
+    segments = await get_segments(db, transcript)
     
     return await llm_service.extract_key_points(segments, count)
 
@@ -416,16 +948,12 @@ async def generate_social(project_id: int, platform: str = "twitter", db: AsyncS
     """Generate social media content from the transcript"""
     from services import llm_service
     
-    result = await db.execute(select(Transcript).where(Transcript.project_id == project_id))
+    result = await db.execute(select(Transcript).where(Transcript.project_id == project_id, Transcript.source_transcript_id.is_(None)))
     transcript = result.scalars().first()
     if not transcript:
         raise HTTPException(status_code=404, detail="Transcript not found")
     
-    import ast
-    try:
-        segments = ast.literal_eval(transcript.content)
-    except:
-        raise HTTPException(status_code=500, detail="Failed to parse transcript")
+    segments = await get_segments(db, transcript)
     
     return await llm_service.generate_social_content(segments, platform)
 
@@ -434,16 +962,12 @@ async def generate_blog(project_id: int, db: AsyncSession = Depends(get_db)):
     """Generate a blog post from the transcript"""
     from services import llm_service
     
-    result = await db.execute(select(Transcript).where(Transcript.project_id == project_id))
+    result = await db.execute(select(Transcript).where(Transcript.project_id == project_id, Transcript.source_transcript_id.is_(None)))
     transcript = result.scalars().first()
     if not transcript:
         raise HTTPException(status_code=404, detail="Transcript not found")
     
-    import ast
-    try:
-        segments = ast.literal_eval(transcript.content)
-    except:
-        raise HTTPException(status_code=500, detail="Failed to parse transcript")
+    segments = await get_segments(db, transcript)
     
     return await llm_service.generate_blog_post(segments)
 
@@ -454,27 +978,60 @@ async def generate_dub(
     project_id: int, 
     lang: str = "en", 
     gender: str = "female",
+    aligned: bool = False,
+    stream: bool = False,
     db: AsyncSession = Depends(get_db)
 ):
-    """Generate TTS audio for the transcript"""
+    """
+    Generate TTS audio for the transcript. Aligned dubs place each
+    segment's speech at its timestamp; otherwise the text is read continuously.
+    With `stream`, the continuous dub is returned as MP3 while it is being
+    synthesized (and saved for /dub/download once complete).
+    """
     from services import tts_service
     
-    result = await db.execute(select(Transcript).where(Transcript.project_id == project_id))
+    result = await db.execute(select(Transcript).where(Transcript.project_id == project_id, Transcript.source_transcript_id.is_(None)))
     transcript = result.scalars().first()
     if not transcript:
         raise HTTPException(status_code=404, detail="Transcript not found")
     
-    import ast
-    try:
-        segments = ast.literal_eval(transcript.content)
-    except:
-        raise HTTPException(status_code=500, detail="Failed to parse transcript")
+    segments = await get_segments(db, transcript)
     
     output_dir = f"downloads/project_{project_id}"
     os.makedirs(output_dir, exist_ok=True)
     output_path = os.path.join(output_dir, f"dub_{lang}_{gender}.mp3")
     
-    result = await tts_service.generate_full_dub(segments, output_path, lang, gender)
+    if stream:
+        if not any(seg.get('text', '').strip() for seg in segments):
+            raise HTTPException(status_code=400, detail="No text to generate TTS for")
+
+        async def dub_stream():
+            tmp = f"{output_path}.{uuid.uuid4().hex}.tmp"
+            try:
+                with open(tmp, "wb") as f:
+                    async for data in tts_service.iter_full_dub(segments, lang, gender):
+                        f.write(data)
+                        yield data
+                os.replace(tmp, output_path)
+            except Exception as e:
+                # Headers are already sent; the client sees a truncated stream
+                logger.error(f"[API] Streaming dub of project {project_id} failed: {e}")
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+        return StreamingResponse(
+            dub_stream(),
+            media_type="audio/mpeg",
+            headers={"Content-Disposition": f"inline; filename=dub_{project_id}_{lang}_{gender}.mp3"},
+        )
+
+    if aligned:
+        result = await db.execute(select(Project.duration).where(Project.id == project_id))
+        duration = result.scalar_one_or_none() or 0
+        result = await tts_service.generate_aligned_dub(segments, output_path, lang, gender, total_duration=duration)
+    else:
+        result = await tts_service.generate_full_dub(segments, output_path, lang, gender)
     
     if result:
         return {"status": "success", "audio_path": result, "download_url": f"/projects/{project_id}/dub/download?lang={lang}&gender={gender}"}
@@ -495,6 +1052,16 @@ async def download_dub(project_id: int, lang: str = "en", gender: str = "female"
         filename=f"dub_{project_id}_{lang}_{gender}.mp3"
     )
 
+@app.get("/models")
+async def list_models():
+    """Loaded Whisper models with load time and resident memory, including parallel-mode workers'."""
+    return transcriber.model_stats()
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Hit/miss counters and memory use of the parsed-transcript cache."""
+    return transcript_cache.stats()
+
 @app.get("/tts/voices")
 async def get_tts_voices():
     """Get available TTS voices"""
@@ -505,38 +1072,83 @@ async def get_tts_voices():
 
 class SearchQuery(BaseModel):
     query: str
-    top_k: int = 10
+    top_k: int = 10 # results per page
+    mode: str = "hybrid" # hybrid, semantic or keyword ("quoted phrases", prefix*)
+    cursor: Optional[str] = None # next_cursor from the previous page
+    # Filters, applied before scoring
+    project_id: Optional[int] = None
+    language: Optional[str] = None
+    speaker: Optional[str] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+    start_time: Optional[float] = None # only segments overlapping this window of the video (seconds)
+    end_time: Optional[float] = None
+
+SEARCH_MODES = ("hybrid", "semantic", "keyword")
+SEARCH_FILTERS = ("project_id", "language", "speaker", "created_after", "created_before", "start_time", "end_time")
+
+# Candidates taken from each ranking before fusing them. Fixed per query so
+# every page slices the same fused ranking; hybrid paging ends after it.
+HYBRID_CANDIDATES = 100
 
 @app.post("/search")
 async def search_all_transcripts(search_query: SearchQuery, db: AsyncSession = Depends(get_db)):
-    """Search across all transcripts semantically."""
-    import ast
-    
-    # Get all transcripts
-    result = await db.execute(select(Transcript))
-    all_transcripts = result.scalars().all()
-    
-    # Get project titles
-    projects_result = await db.execute(select(Project))
-    projects = {p.id: p.title or f"Project {p.id}" for p in projects_result.scalars().all()}
-    
-    # Format transcripts for search
-    transcripts_data = []
-    for t in all_transcripts:
+    """
+    Search across all transcripts: semantically, by keyword, or both fused
+    with reciprocal-rank fusion. Filters narrow the candidates before any
+    scoring. Pages follow `next_cursor`.
+    """
+    if search_query.mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of: {', '.join(SEARCH_MODES)}")
+    if search_query.top_k < 1:
+        raise HTTPException(status_code=400, detail="top_k must be at least 1")
+
+    # Cursors are only valid for the query (and filters) that produced them
+    fingerprint = hashlib.sha1(search_query.model_dump_json(exclude={"cursor", "top_k"}).encode()).hexdigest()[:16]
+    offset = 0
+    if search_query.cursor:
         try:
-            segments = ast.literal_eval(t.content)
-        except:
-            segments = []
-        transcripts_data.append({
-            'project_id': t.project_id,
-            'title': projects.get(t.project_id, 'Unknown'),
-            'segments': segments
-        })
-    
-    # Perform search
-    results = search_transcripts(search_query.query, transcripts_data, search_query.top_k)
-    
-    return {"query": search_query.query, "results": results}
+            offset = decode_cursor(search_query.cursor, fingerprint)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    filters = search_query.model_dump(include=set(SEARCH_FILTERS))
+    clauses = search_filter_clauses(**filters)
+    filtered = any(value is not None for value in filters.values())
+    if search_query.mode == "hybrid":
+        depth = HYBRID_CANDIDATES
+    else:
+        # A single ranking's top results don't change with depth; one extra tells whether there is another page
+        depth = offset + search_query.top_k + 1
+
+    rankings = {}
+    if search_query.mode in ("hybrid", "semantic"):
+        segment_ids = await filtered_segment_ids(db, clauses) if filtered else None
+        loop = asyncio.get_event_loop()
+        hits = await loop.run_in_executor(None, search_index, search_query.query, depth, segment_ids)
+        if hits is not None:
+            rankings["semantic"] = hits
+
+    # Keyword ranking (also the fallback without an embedding model)
+    if search_query.mode != "semantic" or not rankings:
+        if fts_available():
+            rankings["keyword"] = await keyword_search_hits(db, search_query.query, depth, clauses)
+        else:
+            # No FTS5 in this SQLite build: scan the filtered segments
+            documents = await load_filtered_segments(db, clauses)
+            matches = keyword_search(search_query.query, documents, depth)
+            rankings["keyword"] = [(doc['id'], doc['score']) for doc in matches]
+
+    if len(rankings) > 1:
+        ranked = reciprocal_rank_fusion(list(rankings.values()))
+        mode = "hybrid"
+    else:
+        mode, ranked = next(iter(rankings.items()))
+
+    end = offset + search_query.top_k
+    results = await load_search_hits(db, ranked[offset:end])
+    next_cursor = encode_cursor(end, fingerprint) if len(ranked) > end else None
+    return {"query": search_query.query, "mode": mode, "results": results, "next_cursor": next_cursor}
 
 # === Social Clips ===
 
@@ -545,11 +1157,17 @@ async def generate_social_clips(
     project_id: int, 
     duration: int = 30,
     count: int = 3,
+    priority: int = 0,
+    smart_cut: bool = False,
+    aspect_ratios: List[str] = Query(["9:16", "1:1"]),
     db: AsyncSession = Depends(get_db)
 ):
-    """Generate social media clips from project video."""
-    import ast
-    
+    """
+    Queue social clip rendering for a project; poll GET /jobs/{job_id} or GET /projects/{project_id}/clips.
+    aspect_ratios: one clip per ratio and highlight (repeat the parameter); ratios
+    matching the source (e.g. 16:9 for landscape video) are cut without re-encoding.
+    smart_cut: start stream-copied clips exactly on the highlight (H.264 sources only).
+    """
     result = await db.execute(select(Project).where(Project.id == project_id))
     project = result.scalar_one_or_none()
     if not project:
@@ -561,30 +1179,51 @@ async def generate_social_clips(
         raise HTTPException(status_code=400, detail="No video file available")
     
     # Get transcript segments
-    result = await db.execute(select(Transcript).where(Transcript.project_id == project_id))
-    transcript = result.scalar_one_or_none()
-    if not transcript:
+    result = await db.execute(select(Transcript.id).where(Transcript.project_id == project_id, Transcript.source_transcript_id.is_(None)).limit(1))
+    if result.scalar_one_or_none() is None:
         raise HTTPException(status_code=400, detail="No transcript found")
     
-    try:
-        segments = ast.literal_eval(transcript.content)
-    except:
-        segments = []
-    
-    # Generate clips
-    output_dir = f"downloads/{project_id}/clips"
-    clips = create_social_clips(
-        video_path=video_path,
-        segments=segments,
-        output_dir=output_dir,
-        clip_count=count,
-        clip_duration=duration
+    if count < 1:
+        raise HTTPException(status_code=400, detail="count must be at least 1")
+    unknown = [ratio for ratio in aspect_ratios if ratio not in ASPECT_RATIOS]
+    if unknown or not aspect_ratios:
+        raise HTTPException(status_code=400, detail=f"Unknown aspect ratio. Available: {', '.join(ASPECT_RATIOS)}")
+
+    payload = {
+        "duration": duration,
+        "count": count,
+        "smart_cut": smart_cut,
+        "aspect_ratios": list(dict.fromkeys(aspect_ratios)),
+    }
+    job = await scheduler.enqueue(project_id, JobStage.CLIP, payload, priority=priority)
+    logger.info(f"[API] Queued clip rendering of project {project_id} as job {job.id}")
+    return {"message": "Clip rendering queued", "job_id": job.id}
+
+@app.get("/projects/{project_id}/clips")
+async def list_social_clips(project_id: int, db: AsyncSession = Depends(get_db)):
+    """Clips from the latest finished clip job, plus clip jobs still queued or running."""
+    result = await db.execute(
+        select(Job)
+        .where(Job.project_id == project_id, Job.stage == JobStage.CLIP.value)
+        .order_by(Job.id.desc())
     )
-    
+    jobs = result.scalars().all()
+
+    clips = []
+    finished = next((job for job in jobs if job.status == JobStatus.COMPLETED), None)
+    if finished and finished.result:
+        for clip in json.loads(finished.result).get("clips", []):
+            if os.path.exists(clip["path"]):
+                name = os.path.basename(clip["path"])
+                clips.append({**clip, "name": name, "url": f"/projects/{project_id}/clips/{name}"})
+
     return {
-        "status": "success",
-        "clips_generated": len(clips),
-        "clips": clips
+        "clips": clips,
+        "job_id": finished.id if finished else None,
+        "active_jobs": [
+            JobResponse.model_validate(job)
+            for job in jobs if job.status in (JobStatus.QUEUED, JobStatus.RUNNING)
+        ],
     }
 
 @app.get("/projects/{project_id}/clips/{clip_name}")
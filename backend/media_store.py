@@ -0,0 +1,169 @@
+# Content-addressed media store
+# Downloads are deduplicated by extractor + video id and uploads by content
+# hash. Each MediaAsset is reference counted by the projects using it, and the
+# file is deleted when the last project lets go.
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import uuid
+from collections import defaultdict
+from typing import Optional
+
+from fastapi import UploadFile
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal
+from models import MediaAsset, Project
+from services.downloader import MEDIA_DIR, file_sha256, resolve_source_key
+
+logger = logging.getLogger(__name__)
+
+# One download per source at a time, so concurrent projects for the same URL share it
+_source_locks = defaultdict(asyncio.Lock)
+
+def source_lock(key: str) -> asyncio.Lock:
+    return _source_locks[key]
+
+async def find_asset(db: AsyncSession, source_key: str = None, sha256: str = None) -> Optional[MediaAsset]:
+    """Look up a stored asset whose file still exists."""
+    if source_key:
+        query = select(MediaAsset).where(MediaAsset.source_key == source_key)
+    elif sha256:
+        query = select(MediaAsset).where(MediaAsset.sha256 == sha256)
+    else:
+        return None
+    result = await db.execute(query.limit(1))
+    asset = result.scalar_one_or_none()
+    if asset and not os.path.exists(asset.path):
+        logger.warning(f"[MEDIA] File for asset {asset.id} is gone, re-fetching")
+        await db.delete(asset)
+        await db.flush()
+        return None
+    return asset
+
+async def project_audio_sha256(db: AsyncSession, project: Project) -> str:
+    """Content hash of a project's audio, from its asset or by hashing the file."""
+    if project.media_asset_id:
+        result = await db.execute(select(MediaAsset.sha256).where(MediaAsset.id == project.media_asset_id))
+        sha256 = result.scalar_one_or_none()
+        if sha256:
+            return sha256
+    return await asyncio.get_event_loop().run_in_executor(None, file_sha256, project.audio_path)
+
+def attach_asset(project: Project, asset: MediaAsset):
+    """Point a project at an asset and take a reference. The caller commits."""
+    if project.media_asset_id == asset.id:
+        return
+    project.media_asset_id = asset.id
+    project.audio_path = asset.path
+    asset.ref_count = (asset.ref_count or 0) + 1
+
+async def release_asset(db: AsyncSession, asset_id: int):
+    """Drop a project's reference; delete the file when nobody uses it. The caller commits."""
+    result = await db.execute(select(MediaAsset).where(MediaAsset.id == asset_id))
+    asset = result.scalar_one_or_none()
+    if not asset:
+        return
+    asset.ref_count = max(0, (asset.ref_count or 0) - 1)
+    if asset.ref_count == 0:
+        logger.info(f"[MEDIA] Deleting unused {asset.path}")
+        try:
+            os.remove(asset.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Failed to delete media file: {e}")
+        await db.delete(asset)
+
+async def store_upload(db: AsyncSession, file: UploadFile, ext: str) -> MediaAsset:
+    """
+    Stream an upload to disk while hashing it, then keep it only if no
+    identical file is stored yet.
+    """
+    upload_dir = MEDIA_DIR / "sha256"
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = upload_dir / f".upload-{uuid.uuid4().hex}{ext}"
+
+    digest = hashlib.sha256()
+    size = 0
+    with open(tmp_path, "wb") as f:
+        while True:
+            chunk = await file.read(1024 * 1024)
+            if not chunk:
+                break
+            digest.update(chunk)
+            f.write(chunk)
+            size += len(chunk)
+    sha256 = digest.hexdigest()
+
+    asset = await find_asset(db, sha256=sha256)
+    if asset:
+        logger.info(f"[MEDIA] Upload matches stored asset {asset.id}, reusing {asset.path}")
+        os.remove(tmp_path)
+        return asset
+
+    path = upload_dir / f"{sha256}{ext}"
+    os.replace(tmp_path, path)
+    asset = MediaAsset(sha256=sha256, path=str(path), size_bytes=size, title=file.filename)
+    db.add(asset)
+    await db.flush()
+    return asset
+
+async def adopt_legacy_media() -> int:
+    """
+    Register files downloaded before the media store existed (one copy per
+    project) as assets, deleting byte-identical duplicates. Adopted files
+    are moved into the store, so nothing under a project's own directory
+    is shared with other projects.
+    """
+    adopted = 0
+    moved = {}  # old path -> asset, for projects that pointed at the same file
+    loop = asyncio.get_event_loop()
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Project).where(Project.media_asset_id.is_(None), Project.audio_path.is_not(None))
+        )
+        for project in result.scalars().all():
+            legacy_path = os.path.abspath(project.audio_path)
+            asset = moved.get(legacy_path)
+            if asset is None:
+                if not os.path.exists(legacy_path):
+                    continue
+
+                sha256 = await loop.run_in_executor(None, file_sha256, legacy_path)
+                asset = await find_asset(db, sha256=sha256)
+                if asset and os.path.abspath(asset.path) != legacy_path:
+                    logger.info(f"[MEDIA] {project.audio_path} duplicates {asset.path}, removing it")
+                    os.remove(legacy_path)
+                elif not asset:
+                    source_key = await loop.run_in_executor(None, resolve_source_key, project.url or "")
+                    if source_key and await find_asset(db, source_key=source_key):
+                        source_key = None  # Different bytes for a known video; keep it unkeyed
+                    store_dir = MEDIA_DIR / "sha256"
+                    store_dir.mkdir(parents=True, exist_ok=True)
+                    path = store_dir / f"{sha256}{os.path.splitext(legacy_path)[1]}"
+                    shutil.move(legacy_path, path)
+                    logger.info(f"[MEDIA] Moved {project.audio_path} to {path}")
+                    asset = MediaAsset(
+                        source_key=source_key,
+                        sha256=sha256,
+                        path=str(path),
+                        size_bytes=os.path.getsize(path),
+                        title=project.title,
+                        duration=project.duration,
+                        thumbnail_url=project.thumbnail_url,
+                    )
+                    db.add(asset)
+                    await db.flush()
+                moved[legacy_path] = asset
+
+            attach_asset(project, asset)
+            await db.commit()
+            adopted += 1
+
+    if adopted:
+        logger.info(f"[MEDIA] Adopted {adopted} legacy project files")
+    return adopted
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, Enum
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, Enum, Index, Boolean
 from sqlalchemy.orm import declarative_base, relationship
 from datetime import datetime
 import enum
@@ -12,6 +12,19 @@ class ProjectStatus(str, enum.Enum):
     COMPLETED = "completed"
     FAILED = "failed"
 
+class JobStage(str, enum.Enum):
+    DOWNLOAD = "download"
+    TRANSCRIBE = "transcribe"
+    DIARIZE = "diarize"
+    CLIP = "clip"
+
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
 class Project(Base):
     __tablename__ = "projects"
 
@@ -24,11 +37,19 @@ class Project(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Whisper settings requested for this project (None = server default)
+    model_size = Column(String, nullable=True)
+    compute_type = Column(String, nullable=True)
+    language = Column(String, nullable=True) # None = auto-detect
+    
     # Paths to local files
     audio_path = Column(String, nullable=True)
     video_path = Column(String, nullable=True)
+    media_asset_id = Column(Integer, ForeignKey("media_assets.id"), nullable=True)
     
+    media_asset = relationship("MediaAsset")
     transcripts = relationship("Transcript", back_populates="project", cascade="all, delete-orphan")
+    jobs = relationship("Job", back_populates="project", cascade="all, delete-orphan")
 
 class Transcript(Base):
     __tablename__ = "transcripts"
@@ -36,7 +57,123 @@ class Transcript(Base):
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"))
     language = Column(String, default="en")
-    content = Column(Text) # JSON stored as text or raw text
+    content = Column(Text, nullable=True) # legacy str()'d segment list, migrated into `segments`
+    version = Column(Integer, default=1) # bumped whenever segments are rewritten
+    is_complete = Column(Boolean, default=True) # False while segments are still streaming in
+    is_indexed = Column(Boolean, default=False) # segments embedded into the search index
+    source_transcript_id = Column(Integer, ForeignKey("transcripts.id"), nullable=True) # set on translations
+    source_version = Column(Integer, nullable=True) # version of the source a translation was made from
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     project = relationship("Project", back_populates="transcripts")
+    segments = relationship("Segment", back_populates="transcript", cascade="all, delete-orphan", order_by="Segment.position")
+
+class Segment(Base):
+    __tablename__ = "segments"
+    __table_args__ = (
+        Index("ix_segments_transcript_position", "transcript_id", "position", unique=True),
+        Index("ix_segments_transcript_start", "transcript_id", "start"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    transcript_id = Column(Integer, ForeignKey("transcripts.id"), nullable=False)
+    position = Column(Integer, nullable=False) # order within the transcript
+    start = Column(Float, nullable=False) # in seconds
+    end = Column(Float, nullable=False) # in seconds
+    text = Column(Text, nullable=False)
+    speaker = Column(String, nullable=True)
+
+    transcript = relationship("Transcript", back_populates="segments")
+
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Workers claim by (stage, status) ordered by priority
+        Index("ix_jobs_claim", "stage", "status", "priority"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), index=True)
+    stage = Column(String, nullable=False)
+    status = Column(String, default=JobStatus.QUEUED)
+    priority = Column(Integer, default=0) # higher runs first
+    payload = Column(Text, nullable=True) # JSON
+    result = Column(Text, nullable=True) # JSON
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, default=0)
+    progress = Column(Float, default=0.0) # 0.0 - 1.0
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    project = relationship("Project", back_populates="jobs")
+
+class MediaAsset(Base):
+    """A downloaded or uploaded media file, shared by every project that uses it."""
+    __tablename__ = "media_assets"
+
+    id = Column(Integer, primary_key=True, index=True)
+    source_key = Column(String, unique=True, index=True, nullable=True) # "<extractor>:<video id>" for downloads
+    sha256 = Column(String, index=True, nullable=True) # content hash
+    path = Column(String, nullable=False)
+    size_bytes = Column(Integer, nullable=True)
+    ref_count = Column(Integer, default=0) # projects using this file
+
+    # Source metadata, so reusing a download needs no network
+    title = Column(String, nullable=True)
+    duration = Column(Float, nullable=True)
+    thumbnail_url = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class TranscriptionCacheEntry(Base):
+    """Whisper output for an exact audio file and decoding settings."""
+    __tablename__ = "transcription_cache"
+    __table_args__ = (
+        Index(
+            "ix_transcription_cache_key",
+            "audio_sha256", "model_size", "compute_type", "beam_size", "language",
+            unique=True,
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    audio_sha256 = Column(String, nullable=False)
+    model_size = Column(String, nullable=False)
+    compute_type = Column(String, nullable=False)
+    beam_size = Column(Integer, nullable=False)
+    language = Column(String, nullable=False) # requested language, "auto" when detected
+    detected_language = Column(String, nullable=True)
+    language_probability = Column(Float, nullable=True)
+    duration = Column(Float, nullable=True)
+    segments = Column(Text, nullable=False) # JSON list of {"start", "end", "text"}
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class DiarizationCacheEntry(Base):
+    """Raw pyannote speaker turns for an exact audio file."""
+    __tablename__ = "diarization_cache"
+
+    id = Column(Integer, primary_key=True)
+    audio_sha256 = Column(String, nullable=False, unique=True)
+    turns = Column(Text, nullable=False) # JSON list of {"start", "end", "speaker"}
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class TranslationMemoryEntry(Base):
+    """A translated sentence, reused whenever the same text is translated again."""
+    __tablename__ = "translation_memory"
+    __table_args__ = (
+        Index(
+            "ix_translation_memory_key",
+            "source_hash", "source_lang", "target_lang", "model_version",
+            unique=True,
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    source_hash = Column(String, nullable=False) # sha256 of the normalized source text
+    source_lang = Column(String, nullable=False)
+    target_lang = Column(String, nullable=False)
+    model_version = Column(String, nullable=False)
+    source_text = Column(Text, nullable=False)
+    target_text = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,279 @@
+# Persistent job scheduler
+# Jobs are stored in the `jobs` table. Each stage (download, transcribe,
+# diarize, clip) has its own bounded pool of asyncio workers that claim
+# queued jobs by priority, so work survives restarts and never runs unbounded.
+import asyncio
+import json
+import logging
+import os
+import traceback
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from sqlalchemy import select, update
+
+from database import AsyncSessionLocal
+from models import Job, JobStage, JobStatus
+
+logger = logging.getLogger(__name__)
+
+# Workers per stage. Override with SCHEDULER_<STAGE>_WORKERS, e.g. SCHEDULER_TRANSCRIBE_WORKERS=2
+DEFAULT_CONCURRENCY = {
+    JobStage.DOWNLOAD: 3,
+    JobStage.TRANSCRIBE: 1,
+    JobStage.DIARIZE: 1,
+    JobStage.CLIP: 1,
+}
+
+# Idle workers re-check the table this often even without a wakeup
+POLL_INTERVAL = 5.0
+
+# Jobs interrupted more often than this are failed instead of re-queued on restart
+MAX_ATTEMPTS = 3
+
+JobHandler = Callable[[Job, dict], Awaitable[Optional[dict]]]
+FailureHandler = Callable[[Job, Exception], Awaitable[None]]
+
+def stage_concurrency(stage: JobStage) -> int:
+    """Worker count for a stage, from the environment or the default."""
+    value = os.environ.get(f"SCHEDULER_{stage.value.upper()}_WORKERS")
+    if value:
+        try:
+            return max(1, int(value))
+        except ValueError:
+            logger.warning(f"Invalid worker count for {stage.value}: {value}")
+    return DEFAULT_CONCURRENCY.get(stage, 1)
+
+class JobScheduler:
+    def __init__(self):
+        self._handlers: Dict[JobStage, JobHandler] = {}
+        self._failure_handlers: Dict[JobStage, FailureHandler] = {}
+        self._cancellable: Set[JobStage] = set()
+        self._running: Dict[int, asyncio.Task] = {}
+        self._cancelled: Set[int] = set()
+        self._wakeups: Dict[JobStage, asyncio.Event] = {}
+        self._workers: List[asyncio.Task] = []
+
+    def register(
+        self,
+        stage: JobStage,
+        handler: JobHandler,
+        on_failure: Optional[FailureHandler] = None,
+        cancellable: bool = False,
+    ):
+        """
+        Register the coroutine that runs jobs of a stage.
+        `cancellable` handlers may be cancelled while running (they get
+        CancelledError and must clean up after themselves).
+        """
+        self._handlers[stage] = handler
+        if on_failure:
+            self._failure_handlers[stage] = on_failure
+        if cancellable:
+            self._cancellable.add(stage)
+
+    async def enqueue(self, project_id: int, stage: JobStage, payload: Optional[dict] = None, priority: int = 0) -> Job:
+        """Persist a new queued job and wake a worker for its stage."""
+        async with AsyncSessionLocal() as db:
+            job = Job(
+                project_id=project_id,
+                stage=stage.value,
+                status=JobStatus.QUEUED,
+                priority=priority,
+                payload=json.dumps(payload) if payload else None,
+            )
+            db.add(job)
+            await db.commit()
+            await db.refresh(job)
+
+        logger.info(f"[SCHED] Queued {stage.value} job {job.id} for project {project_id} (priority {priority})")
+        self._notify(stage)
+        return job
+
+    async def set_progress(self, job_id: int, progress: float, detail: Optional[dict] = None):
+        """
+        Record progress (0.0 - 1.0) of a running job. `detail` is stored as
+        the job's result until the handler returns the final one.
+        """
+        values = {"progress": progress}
+        if detail is not None:
+            values["result"] = json.dumps(detail)
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(Job).where(Job.id == job_id).values(**values))
+            await db.commit()
+
+    async def cancel(self, job_id: int) -> bool:
+        """Cancel a job that has not started yet, or a running job of a cancellable stage."""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == JobStatus.QUEUED)
+                .values(status=JobStatus.CANCELLED, finished_at=datetime.utcnow())
+            )
+            await db.commit()
+            if result.rowcount > 0:
+                return True
+
+        task = self._running.get(job_id)
+        if task is None or task.done():
+            return False
+        self._cancelled.add(job_id)
+        task.cancel()
+        return True
+
+    async def recover(self) -> int:
+        """
+        Re-queue jobs left RUNNING by a previous process.
+        Jobs that keep getting interrupted are failed (running their stage's
+        failure hook) so they can't crash-loop.
+        """
+        exhausted = []
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Job).where(Job.status == JobStatus.RUNNING))
+            interrupted = result.scalars().all()
+            for job in interrupted:
+                if (job.attempts or 0) >= MAX_ATTEMPTS:
+                    job.status = JobStatus.FAILED
+                    job.error = "Interrupted too many times"
+                    job.finished_at = datetime.utcnow()
+                    exhausted.append(job)
+                else:
+                    job.status = JobStatus.QUEUED
+                    job.started_at = None
+            await db.commit()
+
+        for job in exhausted:
+            logger.error(f"[SCHED] ❌ {job.stage} job {job.id} failed: {job.error}")
+            on_failure = self._failure_handlers.get(JobStage(job.stage))
+            if on_failure:
+                try:
+                    await on_failure(job, Exception(job.error))
+                except Exception as hook_e:
+                    logger.error(f"[SCHED] Failure hook for job {job.id} raised: {hook_e}")
+
+        if interrupted:
+            logger.info(f"[SCHED] Recovered {len(interrupted)} interrupted jobs")
+        return len(interrupted)
+
+    async def start(self):
+        """Recover interrupted jobs and start the worker pools."""
+        await self.recover()
+        for stage in self._handlers:
+            self._wakeups.setdefault(stage, asyncio.Event())
+            workers = stage_concurrency(stage)
+            for n in range(workers):
+                self._workers.append(asyncio.create_task(self._worker(stage, n)))
+            logger.info(f"[SCHED] Started {workers} {stage.value} workers")
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def _notify(self, stage: JobStage):
+        event = self._wakeups.get(stage)
+        if event:
+            event.set()
+
+    async def _claim(self, stage: JobStage) -> Optional[Job]:
+        """Atomically move the highest-priority queued job of a stage to RUNNING."""
+        async with AsyncSessionLocal() as db:
+            while True:
+                result = await db.execute(
+                    select(Job)
+                    .where(Job.stage == stage.value, Job.status == JobStatus.QUEUED)
+                    .order_by(Job.priority.desc(), Job.id)
+                    .limit(1)
+                )
+                job = result.scalar_one_or_none()
+                if job is None:
+                    return None
+
+                claimed = await db.execute(
+                    update(Job)
+                    .where(Job.id == job.id, Job.status == JobStatus.QUEUED)
+                    .values(
+                        status=JobStatus.RUNNING,
+                        started_at=datetime.utcnow(),
+                        attempts=Job.attempts + 1,
+                    )
+                )
+                await db.commit()
+                if claimed.rowcount:
+                    await db.refresh(job)
+                    return job
+                # Another worker got it first; try the next one
+
+    async def _worker(self, stage: JobStage, n: int):
+        event = self._wakeups[stage]
+        while True:
+            event.clear()
+            try:
+                job = await self._claim(stage)
+            except Exception as e:
+                logger.error(f"[SCHED] {stage.value} worker {n} failed to claim a job: {e}")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(event.wait(), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._run(stage, job)
+
+    async def _run(self, stage: JobStage, job: Job):
+        logger.info(f"[SCHED] Running {stage.value} job {job.id} for project {job.project_id}")
+        payload = json.loads(job.payload) if job.payload else {}
+        try:
+            if stage in self._cancellable:
+                task = asyncio.ensure_future(self._handlers[stage](job, payload))
+                self._running[job.id] = task
+                try:
+                    result = await task
+                finally:
+                    self._running.pop(job.id, None)
+            else:
+                result = await self._handlers[stage](job, payload)
+        except asyncio.CancelledError:
+            if job.id in self._cancelled:
+                self._cancelled.discard(job.id)
+                await self._finish(job.id, JobStatus.CANCELLED, error="Cancelled while running")
+                logger.info(f"[SCHED] {stage.value} job {job.id} cancelled")
+                return
+            # Shutdown: leave it RUNNING so recover() re-queues it
+            raise
+        except Exception as e:
+            logger.error(f"[SCHED] ❌ {stage.value} job {job.id} failed: {e}")
+            logger.error(traceback.format_exc())
+            await self._finish(job.id, JobStatus.FAILED, error=str(e))
+            on_failure = self._failure_handlers.get(stage)
+            if on_failure:
+                try:
+                    await on_failure(job, e)
+                except Exception as hook_e:
+                    logger.error(f"[SCHED] Failure hook for job {job.id} raised: {hook_e}")
+            return
+
+        await self._finish(job.id, JobStatus.COMPLETED, result=result)
+        logger.info(f"[SCHED] ✅ {stage.value} job {job.id} completed")
+
+    async def _finish(self, job_id: int, status: JobStatus, result: Optional[dict] = None, error: Optional[str] = None):
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(Job)
+                .where(Job.id == job_id)
+                .values(
+                    status=status,
+                    result=json.dumps(result) if result is not None else None,
+                    error=error,
+                    progress=1.0 if status == JobStatus.COMPLETED else Job.progress,
+                    finished_at=datetime.utcnow(),
+                )
+            )
+            await db.commit()
+
+# Global instance
+scheduler = JobScheduler()
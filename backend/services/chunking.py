@@ -0,0 +1,119 @@
+# backend/services/chunking.py
+# Split long audio at silences and stitch per-chunk transcripts back together
+
+import re
+import logging
+from typing import List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000  # faster-whisper decodes to 16 kHz mono float32
+
+def find_split_points(
+    audio: np.ndarray,
+    sample_rate: int = SAMPLE_RATE,
+    chunk_seconds: float = 300,
+    search_seconds: float = 20,
+    frame_ms: int = 50,
+) -> List[int]:
+    """
+    Pick sample offsets to cut audio into ~chunk_seconds pieces.
+    Each cut lands on the quietest stretch within ±search_seconds of the
+    target, so words aren't split in half.
+    """
+    frame_len = int(sample_rate * frame_ms / 1000)
+    n_frames = len(audio) // frame_len
+    chunk_frames = int(chunk_seconds * 1000 / frame_ms)
+    if n_frames <= chunk_frames:
+        return []
+
+    # Frame RMS energy, smoothed over ~0.5s so we prefer sustained silence over a single quiet frame
+    frames = audio[:n_frames * frame_len].reshape(n_frames, frame_len)
+    energy = np.sqrt(np.mean(frames.astype(np.float32) ** 2, axis=1))
+    smooth = max(1, int(500 / frame_ms))
+    energy = np.convolve(energy, np.ones(smooth) / smooth, mode="same")
+
+    search_frames = int(search_seconds * 1000 / frame_ms)
+    min_gap = chunk_frames // 2
+    splits = []
+    last = 0
+    target = chunk_frames
+    while target < n_frames - min_gap:
+        lo = max(last + min_gap, target - search_frames)
+        hi = min(n_frames - min_gap, target + search_frames)
+        if hi <= lo:
+            break
+        cut = lo + int(np.argmin(energy[lo:hi]))
+        splits.append(cut * frame_len)
+        last = cut
+        target = cut + chunk_frames
+
+    return splits
+
+def split_audio(audio: np.ndarray, sample_rate: int = SAMPLE_RATE, **kwargs) -> List[Tuple[float, np.ndarray]]:
+    """Split audio into (offset_seconds, samples) chunks at silence boundaries."""
+    bounds = [0] + find_split_points(audio, sample_rate, **kwargs) + [len(audio)]
+    return [
+        (bounds[i] / sample_rate, audio[bounds[i]:bounds[i + 1]])
+        for i in range(len(bounds) - 1)
+        if bounds[i + 1] > bounds[i]
+    ]
+
+def _words(text: str) -> List[str]:
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+def _trim_repeated_words(previous: str, text: str, max_words: int = 8, min_words: int = 3) -> str:
+    """
+    Drop leading words of `text` that repeat the tail of `previous`.
+    Repeats shorter than min_words are kept: one or two words recurring
+    across a cut ("I said no" / "no way") are usually real speech.
+    """
+    prev_words = _words(previous)
+    raw_words = text.split()
+    cur_words = [_words(w) for w in raw_words]
+    for k in range(min(max_words, len(prev_words), len(raw_words)), min_words - 1, -1):
+        head = [w for ws in cur_words[:k] for w in ws]
+        if head and head == prev_words[-len(head):]:
+            rest = " ".join(raw_words[k:])
+            return (" " + rest) if rest else ""
+    return text
+
+def stitch_segments(chunk_results: List[Tuple[float, list]]) -> list:
+    """
+    Merge per-chunk segments (timestamps relative to their chunk) into one
+    list with absolute timestamps. Chunks don't overlap, so text is only
+    treated as repeated across a boundary when the first segment after the
+    cut also overlaps the previous one in time (Whisper stretching a
+    segment over the cut).
+    """
+    stitched = []
+    for offset, segments in chunk_results:
+        at_boundary = True
+        for seg in segments:
+            start = seg['start'] + offset
+            end = seg['end'] + offset
+            text = seg['text']
+
+            if stitched:
+                prev = stitched[-1]
+                if end <= prev['end'] and start < offset:
+                    continue  # Before the cut and entirely inside what we already have
+                overlaps = start < prev['end']
+                # A segment after the cut is kept even when the previous chunk's
+                # last timestamp ran past it; it starts where that one ends
+                start = max(start, prev['end'])
+                end = max(end, start)
+                if at_boundary and overlaps:
+                    # Only the first segment after a cut can repeat the previous chunk's tail
+                    if _words(text) == _words(prev['text']):
+                        continue
+                    text = _trim_repeated_words(prev['text'], text)
+                    if not text.strip():
+                        continue
+
+            stitched.append({**seg, 'start': start, 'end': end, 'text': text})
+            at_boundary = False
+
+    return stitched
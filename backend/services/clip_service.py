@@ -1,175 +1,503 @@
 # backend/services/clip_service.py
 # Social clip generator using FFmpeg
 
+import asyncio
+import bisect
+import heapq
+import json
 import os
+import re
 import subprocess
+import tempfile
 import logging
-from typing import Optional, Tuple
+from functools import lru_cache
+from typing import Callable, List, Optional, Sequence, Tuple
 
 logger = logging.getLogger(__name__)
 
-def extract_clip(
-    video_path: str,
-    output_path: str,
-    start_time: float,
-    duration: float = 60,
-    aspect_ratio: str = "16:9",  # 16:9, 9:16, 1:1
-    max_width: int = 1080,
-) -> Optional[str]:
-    """
-    Extract a clip from a video with specified aspect ratio.
-    
-    Args:
-        video_path: Path to source video
-        output_path: Path for output clip
-        start_time: Start time in seconds
-        duration: Clip duration in seconds (default 60)
-        aspect_ratio: Target aspect ratio (16:9, 9:16, 1:1)
-        max_width: Maximum width in pixels
-    
-    Returns:
-        Path to output clip or None if failed
-    """
-    if not os.path.exists(video_path):
-        logger.error(f"Video not found: {video_path}")
-        return None
-    
-    # Determine crop and scale filters based on aspect ratio
+# Highlights rendered at the same time (each is one ffmpeg process, itself multithreaded)
+CLIP_RENDER_WORKERS = int(os.environ.get("CLIP_RENDER_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) // 2)))))
+
+def aspect_filter(aspect_ratio: str, max_width: int = 1080) -> str:
+    """Crop/scale video filter for a target aspect ratio (16:9, 9:16, 1:1)."""
     if aspect_ratio == "9:16":
         # Vertical (TikTok, Reels, Shorts)
-        vf_filter = f"crop=ih*9/16:ih,scale={max_width}:-2"
+        return f"crop=ih*9/16:ih,scale={max_width}:-2"
     elif aspect_ratio == "1:1":
         # Square (Instagram feed)
-        vf_filter = f"crop=min(iw\\,ih):min(iw\\,ih),scale={max_width}:{max_width}"
+        return f"crop=min(iw\\,ih):min(iw\\,ih),scale={max_width}:{max_width}"
     else:
         # Horizontal (YouTube, default)
-        vf_filter = f"scale={max_width}:-2"
-    
+        return f"scale={max_width}:-2"
+
+ASPECT_RATIOS = {"16:9": 16 / 9, "9:16": 9 / 16, "1:1": 1.0}
+# Codecs an .mp4 clip can take without re-encoding
+MP4_VIDEO_CODECS = {"h264", "hevc", "av1", "mpeg4"}
+MP4_AUDIO_CODECS = {"aac", "mp3", "ac3", "eac3", "alac", "opus", "flac"}
+
+@lru_cache(maxsize=64)
+def _probe(video_path: str, mtime: float) -> Optional[dict]:
+    try:
+        result = subprocess.run(
+            [
+                "ffprobe", "-v", "error",
+                "-show_entries", "stream=codec_type,codec_name,profile,pix_fmt,width,height",
+                "-of", "json", video_path,
+            ],
+            capture_output=True, text=True, timeout=30,
+        )
+        if result.returncode != 0:
+            logger.warning(f"ffprobe failed for {video_path}: {result.stderr.strip()}")
+            return None
+        info = {"video": None, "audio": None, "width": 0, "height": 0, "profile": None, "pix_fmt": None}
+        for stream in json.loads(result.stdout).get("streams", []):
+            kind = stream.get("codec_type")
+            if kind in ("video", "audio") and info[kind] is None:
+                info[kind] = stream.get("codec_name")
+                if kind == "video":
+                    info["width"], info["height"] = stream.get("width") or 0, stream.get("height") or 0
+                    info["profile"], info["pix_fmt"] = stream.get("profile"), stream.get("pix_fmt")
+        return info
+    except Exception as e:
+        logger.warning(f"ffprobe unavailable: {e}")
+        return None
+
+def probe_video(video_path: str) -> Optional[dict]:
+    """Codecs and frame format of a media file ({video, audio, width, height, profile, pix_fmt}), or None."""
     try:
-        cmd = [
-            "ffmpeg", "-y",
-            "-ss", str(start_time),
-            "-i", video_path,
-            "-t", str(duration),
-            "-vf", vf_filter,
+        return _probe(video_path, os.path.getmtime(video_path))
+    except OSError:
+        return None
+
+def can_stream_copy(info: Optional[dict], aspect_ratio: str, max_width: int = 1080) -> bool:
+    """
+    True when the source needs no crop or scale for this aspect ratio and
+    its codecs fit an .mp4, so the clip can be cut with -c copy.
+    """
+    if not info or info["video"] not in MP4_VIDEO_CODECS or not info["height"]:
+        return False
+    if info["audio"] and info["audio"] not in MP4_AUDIO_CODECS:
+        return False
+    target = ASPECT_RATIOS.get(aspect_ratio, ASPECT_RATIOS["16:9"])
+    return abs(info["width"] / info["height"] - target) < 0.01 and info["width"] <= max_width
+
+def build_copy_command(video_path: str, output_path: str, start_time: float, duration: float) -> List[str]:
+    """
+    Cut without re-encoding. Input seeking with -c copy starts at the
+    keyframe at or before start_time, so the clip may begin slightly early.
+    """
+    return [
+        "ffmpeg", "-y",
+        "-ss", str(start_time),
+        "-i", video_path,
+        "-t", str(duration),
+        "-map", "0:v:0",
+        "-map", "0:a?",
+        "-c", "copy",
+        "-avoid_negative_ts", "make_zero",
+        "-movflags", "+faststart",
+        output_path,
+    ]
+
+def next_keyframe(video_path: str, start_time: float, window: float = 20) -> Optional[float]:
+    """Time of the first video keyframe at or after start_time (looking `window` seconds ahead)."""
+    try:
+        result = subprocess.run(
+            [
+                "ffprobe", "-v", "error",
+                "-select_streams", "v:0",
+                "-skip_frame", "nokey",
+                "-read_intervals", f"{start_time}%+{window}",
+                "-show_entries", "frame=pts_time",
+                "-of", "csv=p=0", video_path,
+            ],
+            capture_output=True, text=True, timeout=60,
+        )
+    except Exception as e:
+        logger.warning(f"Keyframe probe failed: {e}")
+        return None
+    times = []
+    for line in result.stdout.split():
+        try:
+            times.append(float(line.strip(",")))
+        except ValueError:
+            continue
+    later = [t for t in times if t >= start_time]
+    return min(later) if later else None
+
+# ffprobe H.264 profile -> libx264 -profile:v, for re-encoding a smart cut's head to match the source
+H264_PROFILES = {"Constrained Baseline": "baseline", "Baseline": "baseline", "Main": "main", "High": "high"}
+
+def can_smart_cut(info: Optional[dict]) -> bool:
+    """
+    Smart cut joins a libx264-encoded head to the stream-copied source, so
+    the source must be 8-bit 4:2:0 H.264 in a profile libx264 can match.
+    """
+    return bool(
+        info and info["video"] == "h264"
+        and info["profile"] in H264_PROFILES
+        and info["pix_fmt"] in ("yuv420p", "yuvj420p")
+    )
+
+def build_smart_cut_commands(
+    video_path: str,
+    workdir: str,
+    output_path: str,
+    start_time: float,
+    keyframe: float,
+    end_time: float,
+    info: dict,
+) -> List[List[str]]:
+    """
+    Commands for a frame-accurate cut: re-encode start_time..keyframe with
+    the source's profile and pixel format, stream-copy keyframe..end_time,
+    then join the two with the concat demuxer (list at workdir/parts.txt).
+    Audio is re-encoded in both parts so they concatenate cleanly.
+    """
+    head = os.path.join(workdir, "head.mp4")
+    tail = os.path.join(workdir, "tail.mp4")
+    return [
+        [
+            "ffmpeg", "-y", "-ss", str(start_time), "-i", video_path, "-t", str(keyframe - start_time),
+            "-map", "0:v:0", "-map", "0:a?",
+            "-c:v", "libx264", "-profile:v", H264_PROFILES[info["profile"]], "-pix_fmt", info["pix_fmt"],
+            "-preset", "fast", "-crf", "23", "-c:a", "aac", "-b:a", "128k", head,
+        ],
+        [
+            "ffmpeg", "-y", "-ss", str(keyframe), "-i", video_path, "-t", str(end_time - keyframe),
+            "-map", "0:v:0", "-map", "0:a?",
+            "-c:v", "copy", "-c:a", "aac", "-b:a", "128k", "-avoid_negative_ts", "make_zero", tail,
+        ],
+        [
+            "ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", os.path.join(workdir, "parts.txt"),
+            "-c", "copy", "-movflags", "+faststart", output_path,
+        ],
+    ]
+
+def split_copyable(video_path: str, outputs: List[Tuple[str, str]], max_width: int = 1080) -> Tuple[list, list]:
+    """Partition (output path, aspect ratio) pairs into those that can be stream-copied and those to encode."""
+    info = probe_video(video_path)
+    copy, encode = [], []
+    for output in outputs:
+        (copy if can_stream_copy(info, output[1], max_width) else encode).append(output)
+    return copy, encode
+
+# Machine-readable progress on stdout, errors only on stderr
+PROGRESS_ARGS = ["-progress", "pipe:1", "-nostats", "-loglevel", "error"]
+
+def build_clip_command(
+    video_path: str,
+    outputs: List[Tuple[str, str]],
+    start_time: float,
+    duration: float,
+    max_width: int = 1080,
+    progress: bool = False,
+) -> List[str]:
+    """
+    One ffmpeg command that decodes the range once and writes every
+    (output_path, aspect_ratio) in `outputs`: the decoded video is split
+    in a filter graph and each branch cropped, scaled and encoded.
+    With `progress`, ffmpeg reports key=value progress on stdout.
+    """
+    count = len(outputs)
+    if count == 1:
+        graph = f"[0:v]{aspect_filter(outputs[0][1], max_width)}[v0]"
+    else:
+        branches = "".join(f"[s{i}]" for i in range(count))
+        graph = ";".join(
+            [f"[0:v]split={count}{branches}"]
+            + [f"[s{i}]{aspect_filter(ratio, max_width)}[v{i}]" for i, (_, ratio) in enumerate(outputs)]
+        )
+
+    cmd = ["ffmpeg", "-y"]
+    if progress:
+        cmd += PROGRESS_ARGS
+    cmd += [
+        "-ss", str(start_time),
+        "-i", video_path,
+        "-t", str(duration),
+        "-filter_complex", graph,
+    ]
+    for i, (output_path, _) in enumerate(outputs):
+        cmd += [
+            "-map", f"[v{i}]",
+            "-map", "0:a?",
             "-c:v", "libx264",
             "-preset", "fast",
             "-crf", "23",
             "-c:a", "aac",
             "-b:a", "128k",
-            output_path
+            output_path,
         ]
-        
-        logger.info(f"Extracting clip: {' '.join(cmd)}")
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-        
-        if result.returncode == 0 and os.path.exists(output_path):
-            logger.info(f"Clip extracted: {output_path}")
-            return output_path
-        else:
-            logger.error(f"FFmpeg error: {result.stderr}")
-            return None
-            
-    except subprocess.TimeoutExpired:
-        logger.error("Clip extraction timed out")
-        return None
+    return cmd
+
+async def _run_ffmpeg_async(
+    cmd: List[str],
+    output_paths: List[str],
+    duration: float,
+    timeout: float,
+    on_progress: Optional[Callable[[float], None]] = None,
+) -> bool:
+    """
+    Run an ffmpeg command started with `-progress pipe:1`. If the calling
+    task is cancelled, ffmpeg is killed and partial files removed.
+    """
+    logger.info(f"Extracting clips: {' '.join(cmd)}")
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
     except Exception as e:
         logger.error(f"Clip extraction failed: {e}")
-        return None
+        return False
+
+    async def read_progress():
+        async for line in process.stdout:
+            key, _, value = line.decode(errors="replace").strip().partition("=")
+            # out_time_us (out_time_ms in older ffmpeg, also microseconds)
+            if key in ("out_time_us", "out_time_ms") and value.isdigit() and on_progress:
+                on_progress(min(1.0, int(value) / 1e6 / duration) if duration > 0 else 0.0)
+
+    running = asyncio.gather(read_progress(), process.stderr.read(), process.wait())
+    running.add_done_callback(lambda f: f.cancelled() or f.exception())  # retrieved even when abandoned
+    try:
+        _, stderr, returncode = await asyncio.wait_for(running, timeout=timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        for path in output_paths:
+            if os.path.exists(path):
+                os.remove(path)
+        if isinstance(e, asyncio.TimeoutError):
+            logger.error("Clip extraction timed out")
+            return False
+        raise
+
+    if returncode != 0:
+        logger.error(f"FFmpeg error: {stderr.decode(errors='replace')}")
+    return returncode == 0
 
-def find_highlight_moments(segments: list, count: int = 3) -> list:
+async def _smart_cut_async(
+    video_path: str,
+    output_path: str,
+    start_time: float,
+    duration: float,
+    info: dict,
+    on_progress: Optional[Callable[[float], None]] = None,
+) -> bool:
     """
-    Find potential highlight moments in transcript for clip extraction.
-    Looks for segments with high word density and keywords.
-    
-    Returns list of (start_time, end_time, text) tuples.
+    Frame-accurate stream copy: only the part before the first keyframe
+    after start_time is re-encoded. False when there is nothing to copy
+    (no keyframe inside the range) or a step failed; the caller encodes.
+    """
+    loop = asyncio.get_event_loop()
+    end_time = start_time + duration
+    keyframe = await loop.run_in_executor(None, next_keyframe, video_path, start_time)
+    if keyframe is None or keyframe >= end_time:
+        return False
+    if keyframe - start_time < 0.05:
+        cmd = build_copy_command(video_path, output_path, keyframe, duration)
+        cmd[2:2] = PROGRESS_ARGS
+        return await _run_ffmpeg_async(cmd, [output_path], duration, 300, on_progress)
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(output_path) or ".") as workdir:
+        with open(os.path.join(workdir, "parts.txt"), "w") as f:
+            f.write("file 'head.mp4'\nfile 'tail.mp4'\n")
+        commands = build_smart_cut_commands(video_path, workdir, output_path, start_time, keyframe, end_time, info)
+        # (offset, length) of the range each step writes: head, tail, then the join
+        parts = [(0.0, keyframe - start_time), (keyframe - start_time, end_time - keyframe), (duration, 0.0)]
+        for cmd, (offset, length) in zip(commands, parts):
+            cmd[2:2] = PROGRESS_ARGS
+            report = (
+                (lambda fraction, offset=offset, length=length: on_progress((offset + fraction * length) / duration))
+                if on_progress and length else None
+            )
+            if not await _run_ffmpeg_async(cmd, [output_path], length or duration, 300, report):
+                return False
+    return os.path.exists(output_path)
+
+async def render_clips_async(
+    video_path: str,
+    outputs: List[Tuple[str, str]],
+    start_time: float,
+    duration: float = 60,
+    max_width: int = 1080,
+    on_progress: Optional[Callable[[float], None]] = None,
+    smart_cut: bool = False,
+) -> List[str]:
     """
-    if not segments:
+    Render one source range to several (output path, aspect ratio) pairs.
+    Outputs that need no crop or scale are cut with -c copy; the rest share
+    one ffmpeg run (build_clip_command). `on_progress` gets the
+    fraction (0.0 - 1.0) of the range encoded, from ffmpeg's -progress
+    output, over all of the outputs (stream copies included). Cancelling
+    the calling task kills ffmpeg.
+    With `smart_cut`, stream-copied clips of H.264 sources start exactly at
+    start_time (see can_smart_cut); other codecs keep the plain copy.
+    """
+    if not os.path.exists(video_path):
+        logger.error(f"Video not found: {video_path}")
         return []
-    
-    # Keywords that often indicate important moments
-    highlight_keywords = {
-        'key', 'important', 'crucial', 'amazing', 'incredible', 'secret',
-        'tip', 'trick', 'hack', 'solution', 'problem', 'answer', 'why',
-        'how to', 'best', 'worst', 'never', 'always', 'must', 'should',
-        'first', 'finally', 'biggest', 'smallest', 'most', 'least'
-    }
-    
-    scored_segments = []
-    for i, seg in enumerate(segments):
-        text = seg.get('text', '').lower()
-        start = seg.get('start', 0)
-        end = seg.get('end', 0)
-        
-        # Score based on keywords
-        score = sum(1 for kw in highlight_keywords if kw in text)
-        
-        # Score based on exclamation/question marks
-        score += text.count('!') * 0.5
-        score += text.count('?') * 0.3
-        
-        # Prefer segments not at very start or end
-        position_score = 1.0
-        if i < 3:
-            position_score = 0.5
-        elif i > len(segments) - 3:
-            position_score = 0.7
-        
-        score *= position_score
-        
-        if score > 0:
-            scored_segments.append({
-                'index': i,
-                'start': start,
-                'end': end,
-                'text': seg.get('text', ''),
-                'score': score
-            })
-    
-    # Sort by score and return top moments
-    scored_segments.sort(key=lambda x: x['score'], reverse=True)
-    return scored_segments[:count]
 
-def create_social_clips(
+    loop = asyncio.get_event_loop()
+    copy, encode = await loop.run_in_executor(None, split_copyable, video_path, outputs, max_width)
+    info = probe_video(video_path) if copy and smart_cut else None  # cached by split_copyable
+    # Each copy is one step of the progress, the shared encode run another
+    steps = len(copy) + (1 if encode else 0)
+
+    def step_progress(step: int, total: int) -> Optional[Callable[[float], None]]:
+        return (lambda fraction: on_progress((step + fraction) / total)) if on_progress else None
+
+    written = []
+    for step, (output_path, ratio) in enumerate(copy):
+        if can_smart_cut(info):
+            copied = await _smart_cut_async(
+                video_path, output_path, start_time, duration, info, step_progress(step, steps)
+            )
+        else:
+            cmd = build_copy_command(video_path, output_path, start_time, duration)
+            cmd[2:2] = PROGRESS_ARGS
+            copied = await _run_ffmpeg_async(cmd, [output_path], duration, 300, step_progress(step, steps))
+        if copied:
+            written.append(output_path)
+        else:
+            encode.append((output_path, ratio))  # fall back to encoding this one
+
+    if encode:
+        cmd = build_clip_command(video_path, encode, start_time, duration, max_width, progress=True)
+        report = step_progress(len(copy), len(copy) + 1)
+        if await _run_ffmpeg_async(cmd, [path for path, _ in encode], duration, 300 * len(encode), report):
+            written += [path for path, _ in encode if os.path.exists(path)]
+    if written:
+        logger.info(f"Clips extracted: {', '.join(written)}")
+    return written
+
+async def render_social_clips(
     video_path: str,
     segments: list,
     output_dir: str,
     clip_count: int = 3,
     clip_duration: float = 30,
+    aspect_ratios: Sequence[str] = ("9:16", "1:1"),
+    on_progress: Optional[Callable[[int, float], None]] = None,
+    smart_cut: bool = False,
 ) -> list:
     """
-    Automatically create social media clips from a video.
-    
+    Automatically create social media clips from a video: each highlight
+    is rendered to every aspect ratio by render_clips_async, at most
+    CLIP_RENDER_WORKERS ffmpeg processes at once, with
+    `on_progress(highlight index, fraction)` as each one encodes.
+    `smart_cut` is passed to render_clips_async.
+    If one highlight fails or the caller is cancelled, the others are
+    cancelled and awaited, so no ffmpeg or partial file outlives the call.
+
     Returns list of created clip paths with metadata.
     """
     os.makedirs(output_dir, exist_ok=True)
-    
-    # Find highlight moments
-    highlights = find_highlight_moments(segments, clip_count)
-    
-    clips = []
-    for i, highlight in enumerate(highlights):
+    highlights = find_highlight_moments(segments, clip_count, clip_duration)
+    limit = asyncio.Semaphore(CLIP_RENDER_WORKERS)
+
+    async def render(i, highlight):
         start = max(0, highlight['start'] - 2)  # Start 2s before highlight
-        
-        for ratio in ["9:16", "1:1"]:
-            ratio_slug = ratio.replace(":", "x")
-            output_path = os.path.join(output_dir, f"clip_{i+1}_{ratio_slug}.mp4")
-            
-            result = extract_clip(
-                video_path=video_path,
-                output_path=output_path,
-                start_time=start,
-                duration=clip_duration,
-                aspect_ratio=ratio
+        outputs = [
+            (os.path.join(output_dir, f"clip_{i+1}_{ratio.replace(':', 'x')}.mp4"), ratio)
+            for ratio in aspect_ratios
+        ]
+        async with limit:
+            written = await render_clips_async(
+                video_path, outputs, start, clip_duration,
+                on_progress=(lambda fraction: on_progress(i, fraction)) if on_progress else None,
+                smart_cut=smart_cut,
             )
-            
-            if result:
-                clips.append({
-                    'path': result,
-                    'aspect_ratio': ratio,
-                    'start_time': start,
-                    'duration': clip_duration,
-                    'highlight_text': highlight['text'][:100]
-                })
+        if on_progress:
+            on_progress(i, 1.0)
+        return [
+            {
+                'path': output_path,
+                'aspect_ratio': ratio,
+                'start_time': start,
+                'duration': clip_duration,
+                'highlight_text': highlight['text'][:100]
+            }
+            for output_path, ratio in outputs if output_path in written
+        ]
+
+    tasks = [asyncio.ensure_future(render(i, highlight)) for i, highlight in enumerate(highlights)]
+    try:
+        rendered = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    return [clip for clips in rendered for clip in clips]
+
+
+# Keywords that often indicate important moments
+HIGHLIGHT_KEYWORDS = (
+    'key', 'important', 'crucial', 'amazing', 'incredible', 'secret',
+    'tip', 'trick', 'hack', 'solution', 'problem', 'answer', 'why',
+    'how to', 'best', 'worst', 'never', 'always', 'must', 'should',
+    'first', 'finally', 'biggest', 'smallest', 'most', 'least'
+)
+# One pass over the text for all keywords; anchored at a word start so
+# "tips" counts but "monkey" does not. Longest first so "how to" wins over shorter prefixes.
+HIGHLIGHT_PATTERN = re.compile(
+    r"\b(?:" + "|".join(re.escape(kw) for kw in sorted(HIGHLIGHT_KEYWORDS, key=len, reverse=True)) + ")"
+)
+
+def segment_highlight_score(text: str) -> float:
+    """Distinct keywords, plus 0.5 per '!' and 0.3 per '?'."""
+    text = text.lower()
+    return len(set(HIGHLIGHT_PATTERN.findall(text))) + text.count('!') * 0.5 + text.count('?') * 0.3
+
+def find_highlight_moments(segments: list, count: int = 3, clip_duration: float = 30) -> list:
+    """
+    Find potential highlight moments in transcript for clip extraction.
+    Every segment start is a candidate window of `clip_duration` seconds,
+    scored by the keywords and punctuation of the segments it covers (prefix
+    sums make each window O(1)). The best windows that do not overlap are
+    picked, so every clip shows a different moment.
+    
+    Returns list of {index, start, end, text, score} dicts, best first.
+    """
+    if not segments or count <= 0:
+        return []
     
-    return clips
+    n = len(segments)
+    starts = [seg.get('start', 0) for seg in segments]
+    prefix = [0.0]
+    for i, seg in enumerate(segments):
+        score = segment_highlight_score(seg.get('text', ''))
+        # Prefer segments not at very start or end
+        if i < 3:
+            score *= 0.5
+        elif i > n - 3:
+            score *= 0.7
+        prefix.append(prefix[-1] + score)
+
+    # Window i covers segments i..ends[i]-1 (those starting within clip_duration)
+    ends = [bisect.bisect_left(starts, start + clip_duration, lo=i + 1) for i, start in enumerate(starts)]
+    heap = [(-(prefix[ends[i]] - prefix[i]), i) for i in range(n) if prefix[ends[i]] - prefix[i] > 0]
+    heapq.heapify(heap)
+
+    chosen = []
+    while heap and len(chosen) < count:
+        neg_score, i = heapq.heappop(heap)
+        window_start = starts[i]
+        if any(window_start < other + clip_duration and other < window_start + clip_duration for other, _, _ in chosen):
+            continue
+        chosen.append((window_start, i, -neg_score))
+
+    highlights = []
+    for window_start, i, score in chosen:
+        covered = segments[i:ends[i]]
+        highlights.append({
+            'index': i,
+            'start': window_start,
+            'end': max(seg.get('end', 0) for seg in covered),
+            'text': " ".join(seg.get('text', '').strip() for seg in covered),
+            'score': score
+        })
+    return highlights
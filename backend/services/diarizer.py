@@ -1,5 +1,6 @@
 # Speaker Diarization Service using pyannote-audio
 # Note: Requires HuggingFace token for pyannote models
+import heapq
 import logging
 import os
 
@@ -62,36 +63,63 @@ def diarize_audio(audio_path: str):
         logger.error(f"Diarization error: {e}")
         return []
 
+def _assign_speakers(intervals, speaker_segments):
+    """
+    Index of the speaker turn overlapping each (start, end) interval the
+    most, or None without any overlap. Ties go to the turn that comes first
+    in `speaker_segments`.
+
+    Sweep line: intervals and turns are both walked in start order, keeping
+    only the turns that can still overlap (a heap by end time), so the cost
+    is O((N + M) log M) plus the number of concurrently active turns rather
+    than N * M.
+    """
+    turn_order = sorted(range(len(speaker_segments)), key=lambda i: speaker_segments[i]['start'])
+    interval_order = sorted(range(len(intervals)), key=lambda i: intervals[i][0])
+
+    best = [None] * len(intervals)
+    active = set()
+    ending = []  # (end, turn index) of active turns
+    next_turn = 0
+    for i in interval_order:
+        t_start, t_end = intervals[i]
+
+        # Turns starting before this interval ends might overlap it
+        while next_turn < len(turn_order) and speaker_segments[turn_order[next_turn]]['start'] < t_end:
+            j = turn_order[next_turn]
+            active.add(j)
+            heapq.heappush(ending, (speaker_segments[j]['end'], j))
+            next_turn += 1
+        # Turns ending before it starts can't overlap this or any later interval
+        while ending and ending[0][0] <= t_start:
+            active.discard(heapq.heappop(ending)[1])
+
+        best_turn = None
+        best_overlap = 0
+        for j in active:
+            sp_seg = speaker_segments[j]
+            overlap = min(t_end, sp_seg['end']) - max(t_start, sp_seg['start'])
+            if overlap > best_overlap or (overlap == best_overlap and best_turn is not None and j < best_turn):
+                best_overlap = overlap
+                best_turn = j
+        best[i] = best_turn
+    return best
+
 def merge_segments_with_speakers(transcript_segments, speaker_segments):
     """
     Merge transcript segments with speaker labels.
     Assigns speaker based on which speaker segment overlaps most with the transcript segment.
+    Returns one segment per input segment, in the same order.
     """
     if not speaker_segments:
         return transcript_segments
-    
+
+    intervals = [(seg.get('start', 0), seg.get('end', 0)) for seg in transcript_segments]
+    best = _assign_speakers(intervals, speaker_segments)
+
     merged = []
-    for seg in transcript_segments:
-        t_start = seg.get('start', 0)
-        t_end = seg.get('end', 0)
-        
-        # Find best matching speaker
-        best_speaker = None
-        best_overlap = 0
-        
-        for sp_seg in speaker_segments:
-            sp_start = sp_seg['start']
-            sp_end = sp_seg['end']
-            
-            # Calculate overlap
-            overlap_start = max(t_start, sp_start)
-            overlap_end = min(t_end, sp_end)
-            overlap = max(0, overlap_end - overlap_start)
-            
-            if overlap > best_overlap:
-                best_overlap = overlap
-                best_speaker = sp_seg['speaker']
-        
+    for seg, turn in zip(transcript_segments, best):
+        best_speaker = speaker_segments[turn]['speaker'] if turn is not None else None
         new_seg = seg.copy()
         if best_speaker:
             new_seg['speaker'] = best_speaker
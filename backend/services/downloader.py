@@ -1,7 +1,9 @@
 import yt_dlp
 import asyncio
+import hashlib
 import os
 from pathlib import Path
+from typing import Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,14 +12,43 @@ logger = logging.getLogger(__name__)
 DOWNLOAD_DIR = Path("downloads")
 DOWNLOAD_DIR.mkdir(exist_ok=True)
 
-async def download_audio(url: str, project_id: int) -> dict:
+# Content-addressed store: downloads live at media/<extractor>/<video id>.<ext>,
+# uploads at media/sha256/<hash>.<ext>
+MEDIA_DIR = DOWNLOAD_DIR / "media"
+
+def resolve_source_key(url: str) -> Optional[str]:
+    """
+    Identify a URL as "<extractor>:<video id>" (e.g. "Youtube:jNQXAC9IVRw")
+    using yt-dlp's URL patterns only - no network request.
+    Returns None for URLs only the generic extractor would handle.
+    """
+    for ie in yt_dlp.extractor.gen_extractor_classes():
+        if ie.ie_key() == "Generic" or not ie.suitable(url):
+            continue
+        try:
+            video_id = ie.get_temp_id(url)
+        except Exception:
+            video_id = None
+        return f"{ie.ie_key()}:{video_id}" if video_id else None
+    return None
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+async def download_audio(url: str) -> dict:
     """
     Downloads audio from a YouTube URL using yt-dlp.
     Downloads in native format (WebM/M4A) - NO FFmpeg required!
     Whisper can transcribe these formats directly.
+    Files are stored by extractor and video id, so the same video always
+    lands on the same path.
     """
-    output_template = str(DOWNLOAD_DIR / f"{project_id}_%(title)s.%(ext)s")
-    
+    output_template = str(MEDIA_DIR / "%(extractor_key)s" / "%(id)s.%(ext)s")
+
     # Download best audio without any postprocessing (no FFmpeg needed!)
     ydl_opts = {
         'format': 'bestaudio/best',  # Download best audio stream
@@ -35,40 +66,30 @@ async def download_audio(url: str, project_id: int) -> dict:
         try:
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
                 info = ydl.extract_info(url, download=True)
-                return info, None
+                return info, ydl.prepare_filename(info), None
         except Exception as e:
             logger.error(f"Download failed: {str(e)}")
-            return None, str(e)
+            return None, None, str(e)
 
     # Run blocking yt-dlp in a separate thread
     loop = asyncio.get_event_loop()
-    info, error = await loop.run_in_executor(None, _run_download)
-    
+    info, filename, error = await loop.run_in_executor(None, _run_download)
+
     if error or not info:
         raise Exception(f"Download failed: {error}")
-    
-    # Find the actual downloaded file
-    title = info.get('title', 'audio')
-    ext = info.get('ext', 'webm')  # Usually webm, m4a, or opus
-    
-    # Clean title for filename
-    import re
-    clean_title = re.sub(r'[^\w\s-]', '', title)[:50]  # Remove special chars, limit length
-    
-    expected_filename = str(DOWNLOAD_DIR / f"{project_id}_{title}.{ext}")
-    
-    # Try to find the file that was actually created
-    actual_files = list(DOWNLOAD_DIR.glob(f"{project_id}_*"))
-    if actual_files:
-        filename = str(actual_files[0])  # Use the first match
-        logger.info(f"Found downloaded file: {filename}")
-    else:
-        filename = expected_filename
-        logger.warning(f"Could not find downloaded file, using expected: {filename}")
-    
+
+    if not os.path.exists(filename):
+        raise Exception(f"Downloaded file not found: {filename}")
+    logger.info(f"Found downloaded file: {filename}")
+
+    sha256 = await loop.run_in_executor(None, file_sha256, filename)
+
     return {
         "title": info.get("title"),
         "duration": info.get("duration"),
         "thumbnail": info.get("thumbnail"),
-        "file_path": filename
+        "file_path": filename,
+        "source_key": f"{info.get('extractor_key')}:{info.get('id')}",
+        "sha256": sha256,
+        "size_bytes": os.path.getsize(filename),
     }
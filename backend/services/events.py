@@ -0,0 +1,57 @@
+# backend/services/events.py
+# In-process pub/sub used to push live job events (e.g. transcript segments) to streaming clients
+
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, Dict, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+class EventHub:
+    """
+    Fan-out of events per topic (e.g. a project id) to any number of
+    subscriber queues. Events of the run in progress are kept so a client
+    that subscribes midway gets everything from the start, without gaps.
+    Must be used from the event loop thread.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[Any, Set[asyncio.Queue]] = defaultdict(set)
+        self._history: Dict[Any, List[dict]] = {}
+
+    def start(self, topic):
+        """Begin a new run for a topic, discarding events of any earlier run."""
+        self._history[topic] = []
+
+    def finish(self, topic, event: dict):
+        """Publish the final event of a run and drop its history."""
+        self.publish(topic, event)
+        self._history.pop(topic, None)
+
+    def publish(self, topic, event: dict):
+        history = self._history.get(topic)
+        if history is not None:
+            history.append(event)
+        for queue in self._subscribers.get(topic, ()):
+            queue.put_nowait(event)
+
+    def subscribe(self, topic) -> Tuple[List[dict], asyncio.Queue]:
+        """Returns the events published so far in the current run and a queue for the rest."""
+        queue = asyncio.Queue()
+        self._subscribers[topic].add(queue)
+        return list(self._history.get(topic, ())), queue
+
+    def unsubscribe(self, topic, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(topic)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[topic]
+
+    def is_running(self, topic) -> bool:
+        return topic in self._history
+
+# Global instance for transcription progress, keyed by project id
+transcription_events = EventHub()
@@ -0,0 +1,92 @@
+# backend/services/export_cache.py
+# On-disk cache of rendered transcript exports (SRT, VTT, ...), keyed by transcript version
+
+import os
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+from services.exporter import EXPORT_FORMAT_VERSION, FORMATS
+
+EXPORT_CACHE_DIR = os.environ.get("EXPORT_CACHE_DIR", "downloads/exports")
+
+class ExportCache:
+    """
+    Rendered exports live at
+    <dir>/<transcript id>/c<created stamp>-v<version>-e<format version>.<ext>.
+    A transcript's version changes whenever its segments do, and the
+    creation time tells apart rows that reuse a deleted transcript's id,
+    so a file is valid for as long as it exists; older versions are
+    removed when a newer one is written.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    @staticmethod
+    def _stamp(created_at: Optional[datetime]) -> str:
+        return created_at.strftime("%Y%m%d%H%M%S%f") if created_at else "0"
+
+    @classmethod
+    def etag(cls, transcript_id: int, created_at: Optional[datetime], version: int, format: str) -> str:
+        return f'"t{transcript_id}-c{cls._stamp(created_at)}-v{version}-{format}-e{EXPORT_FORMAT_VERSION}"'
+
+    def path(self, transcript_id: int, created_at: Optional[datetime], version: int, format: str) -> Path:
+        name = f"c{self._stamp(created_at)}-v{version}-e{EXPORT_FORMAT_VERSION}.{FORMATS[format][2]}"
+        return self.directory / str(transcript_id) / name
+
+    def get(self, transcript_id: int, created_at: Optional[datetime], version: int, format: str) -> Optional[Path]:
+        path = self.path(transcript_id, created_at, version, format)
+        return path if path.exists() else None
+
+    @staticmethod
+    def read(path: Path, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        with open(path, "rb") as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+    def write_through(
+        self, chunks: Iterator[bytes], transcript_id: int, created_at: Optional[datetime], version: int, format: str
+    ) -> Iterator[bytes]:
+        """
+        Pass chunks through while saving them; the file is only published
+        once the whole export was produced (an aborted download leaves nothing).
+        """
+        path = self.path(transcript_id, created_at, version, format)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{uuid.uuid4().hex}.tmp")
+        complete = False
+        try:
+            with open(tmp, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            complete = True
+        finally:
+            if complete:
+                os.replace(tmp, path)
+                self._remove_stale(path)
+            else:
+                tmp.unlink(missing_ok=True)
+
+    def _remove_stale(self, current: Path):
+        """Drop other versions (and older rows' files) of the same format."""
+        for other in current.parent.glob(f"[cv]*{current.suffix}"):
+            if other != current:
+                other.unlink(missing_ok=True)
+
+    def invalidate(self, transcript_id: int):
+        """Remove every cached export of a transcript."""
+        folder = self.directory / str(transcript_id)
+        if not folder.exists():
+            return
+        for path in folder.iterdir():
+            path.unlink(missing_ok=True)
+        try:
+            folder.rmdir()
+        except OSError:
+            pass
+
+# Global instance
+export_cache = ExportCache(EXPORT_CACHE_DIR)
@@ -1,5 +1,13 @@
 # Transcript Export Service
-# Converts segments to SRT, VTT, and TXT formats
+# Converts segments to SRT, VTT, TXT, JSON, TSV, ASS and TTML formats.
+# Each format is a generator of text chunks (iter_*) so large transcripts can be
+# streamed; to_* joins them into one string.
+import json
+from typing import Callable, Dict, Iterable, Iterator, Tuple
+from xml.sax.saxutils import escape
+
+# Bump when the output of any format changes, so cached exports are rebuilt
+EXPORT_FORMAT_VERSION = 1
 
 def format_timestamp_srt(seconds: float) -> str:
     """Convert seconds to SRT timestamp format: HH:MM:SS,mmm"""
@@ -17,60 +25,161 @@ def format_timestamp_vtt(seconds: float) -> str:
     millis = int((seconds - int(seconds)) * 1000)
     return f"{hours:02d}:{minutes:02d}:{secs:02d}.{millis:03d}"
 
-def to_srt(segments: list) -> str:
-    """Convert transcript segments to SRT subtitle format"""
-    lines = []
+def format_timestamp_ass(seconds: float) -> str:
+    """Convert seconds to ASS timestamp format: H:MM:SS.cc"""
+    centis = int(round(seconds * 100))
+    hours, centis = divmod(centis, 360000)
+    minutes, centis = divmod(centis, 6000)
+    secs, centis = divmod(centis, 100)
+    return f"{hours:d}:{minutes:02d}:{secs:02d}.{centis:02d}"
+
+def iter_srt(segments: Iterable[dict]) -> Iterator[str]:
+    """SRT subtitle format, one entry per chunk"""
     for i, seg in enumerate(segments, 1):
         start = seg.get('start', 0)
         end = seg.get('end', 0)
         text = seg.get('text', '').strip()
         speaker = seg.get('speaker', '')
-        
+
         if speaker:
             text = f"[{speaker}] {text}"
-        
-        lines.append(str(i))
-        lines.append(f"{format_timestamp_srt(start)} --> {format_timestamp_srt(end)}")
-        lines.append(text)
-        lines.append("")  # Blank line between entries
-    
-    return "\n".join(lines)
 
-def to_vtt(segments: list) -> str:
-    """Convert transcript segments to WebVTT subtitle format"""
-    lines = ["WEBVTT", ""]  # VTT header
-    
-    for i, seg in enumerate(segments, 1):
+        # Blank line between entries
+        yield f"{'' if i == 1 else chr(10)}{i}\n{format_timestamp_srt(start)} --> {format_timestamp_srt(end)}\n{text}\n"
+
+def iter_vtt(segments: Iterable[dict]) -> Iterator[str]:
+    """WebVTT subtitle format, one cue per chunk"""
+    yield "WEBVTT\n"  # VTT header
+
+    for seg in segments:
         start = seg.get('start', 0)
         end = seg.get('end', 0)
         text = seg.get('text', '').strip()
         speaker = seg.get('speaker', '')
-        
+
         if speaker:
             text = f"<v {speaker}>{text}"
-        
-        lines.append(f"{format_timestamp_vtt(start)} --> {format_timestamp_vtt(end)}")
-        lines.append(text)
-        lines.append("")
-    
-    return "\n".join(lines)
 
-def to_txt(segments: list) -> str:
-    """Convert transcript segments to plain text with timestamps"""
-    lines = []
-    for seg in segments:
+        yield f"\n{format_timestamp_vtt(start)} --> {format_timestamp_vtt(end)}\n{text}\n"
+
+def iter_txt(segments: Iterable[dict]) -> Iterator[str]:
+    """Plain text with timestamps, one line per chunk"""
+    for i, seg in enumerate(segments):
         start = seg.get('start', 0)
         text = seg.get('text', '').strip()
         speaker = seg.get('speaker', '')
-        
+
         # Format: [MM:SS] [SPEAKER] Text
         mins = int(start // 60)
         secs = int(start % 60)
         timestamp = f"[{mins:02d}:{secs:02d}]"
-        
-        if speaker:
-            lines.append(f"{timestamp} [{speaker}] {text}")
-        else:
-            lines.append(f"{timestamp} {text}")
-    
-    return "\n".join(lines)
+
+        line = f"{timestamp} [{speaker}] {text}" if speaker else f"{timestamp} {text}"
+        yield line if i == 0 else "\n" + line
+
+def iter_json(segments: Iterable[dict]) -> Iterator[str]:
+    """JSON array of {"start", "end", "text"[, "speaker"]}"""
+    yield "["
+    for i, seg in enumerate(segments):
+        entry = {"start": seg.get('start', 0), "end": seg.get('end', 0), "text": seg.get('text', '').strip()}
+        if seg.get('speaker'):
+            entry["speaker"] = seg['speaker']
+        yield ("" if i == 0 else ",") + "\n  " + json.dumps(entry, ensure_ascii=False)
+    yield "\n]\n"
+
+def iter_tsv(segments: Iterable[dict]) -> Iterator[str]:
+    """Tab-separated start/end in milliseconds, speaker and text (Whisper's TSV plus a speaker column)"""
+    yield "start\tend\tspeaker\ttext\n"
+    for seg in segments:
+        text = " ".join(seg.get('text', '').split())  # no tabs or newlines inside a field
+        yield f"{int(round(seg.get('start', 0) * 1000))}\t{int(round(seg.get('end', 0) * 1000))}\t{seg.get('speaker') or ''}\t{text}\n"
+
+ASS_HEADER = """[Script Info]
+ScriptType: v4.00+
+PlayResX: 1920
+PlayResY: 1080
+WrapStyle: 0
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default,Arial,64,&H00FFFFFF,&H000000FF,&H00000000,&H64000000,0,0,0,0,100,100,0,0,1,3,1,2,60,60,60,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+def iter_ass(segments: Iterable[dict]) -> Iterator[str]:
+    """Advanced SubStation Alpha subtitles; the speaker goes in the Name field"""
+    yield ASS_HEADER
+    for seg in segments:
+        text = seg.get('text', '').strip().replace("{", "(").replace("}", ")").replace("\n", "\\N")
+        speaker = (seg.get('speaker') or '').replace(",", " ")
+        yield f"Dialogue: 0,{format_timestamp_ass(seg.get('start', 0))},{format_timestamp_ass(seg.get('end', 0))},Default,{speaker},0,0,0,,{text}\n"
+
+def iter_ttml(segments: Iterable[dict]) -> Iterator[str]:
+    """Timed Text Markup Language (W3C TTML1)"""
+    yield (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<tt xmlns="http://www.w3.org/ns/ttml" xml:lang="">\n'
+        '  <body>\n'
+        '    <div>\n'
+    )
+    for seg in segments:
+        text = escape(seg.get('text', '').strip())
+        if seg.get('speaker'):
+            text = f"[{escape(seg['speaker'])}] {text}"
+        yield (
+            f'      <p begin="{format_timestamp_vtt(seg.get("start", 0))}" '
+            f'end="{format_timestamp_vtt(seg.get("end", 0))}">{text}</p>\n'
+        )
+    yield '    </div>\n  </body>\n</tt>\n'
+
+# format -> (generator, media type, file extension)
+FORMATS: Dict[str, Tuple[Callable[[Iterable[dict]], Iterator[str]], str, str]] = {
+    "txt": (iter_txt, "text/plain", "txt"),
+    "srt": (iter_srt, "application/x-subrip", "srt"),
+    "vtt": (iter_vtt, "text/vtt", "vtt"),
+    "json": (iter_json, "application/json", "json"),
+    "tsv": (iter_tsv, "text/tab-separated-values", "tsv"),
+    "ass": (iter_ass, "text/x-ssa", "ass"),
+    "ttml": (iter_ttml, "application/ttml+xml", "ttml"),
+}
+
+def iter_export(segments: Iterable[dict], format: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """UTF-8 encoded export in chunks of about `chunk_size` bytes, for streaming."""
+    render = FORMATS[format][0]
+    buffer = []
+    size = 0
+    for piece in render(segments):
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield "".join(buffer).encode("utf-8")
+            buffer = []
+            size = 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+def to_srt(segments: list) -> str:
+    """Convert transcript segments to SRT subtitle format"""
+    return "".join(iter_srt(segments))
+
+def to_vtt(segments: list) -> str:
+    """Convert transcript segments to WebVTT subtitle format"""
+    return "".join(iter_vtt(segments))
+
+def to_txt(segments: list) -> str:
+    """Convert transcript segments to plain text with timestamps"""
+    return "".join(iter_txt(segments))
+
+def to_json(segments: list) -> str:
+    return "".join(iter_json(segments))
+
+def to_tsv(segments: list) -> str:
+    return "".join(iter_tsv(segments))
+
+def to_ass(segments: list) -> str:
+    return "".join(iter_ass(segments))
+
+def to_ttml(segments: list) -> str:
+    return "".join(iter_ttml(segments))
@@ -0,0 +1,194 @@
+# backend/services/model_pool.py
+# Warm, thread-safe pool of Whisper models keyed by (model size, compute type)
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from faster_whisper import WhisperModel
+
+logger = logging.getLogger(__name__)
+
+MODEL_SIZES = {
+    "tiny", "tiny.en", "base", "base.en", "small", "small.en",
+    "medium", "medium.en", "large-v1", "large-v2", "large-v3",
+}
+COMPUTE_TYPES = {"int8", "int8_float16", "int8_float32", "int16", "float16", "float32"}
+
+# Approximate resident size in MB at int8, used when RSS can't be measured
+APPROX_MODEL_MB = {
+    "tiny": 75, "base": 145, "small": 480, "medium": 1500,
+    "large-v1": 3000, "large-v2": 3000, "large-v3": 3000,
+}
+
+ModelKey = Tuple[str, str]
+
+def _rss_bytes() -> Optional[int]:
+    """Current resident set size (Linux only)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _approx_bytes(model_size: str, compute_type: str) -> int:
+    mb = APPROX_MODEL_MB.get(model_size.replace(".en", ""), 500)
+    if compute_type.startswith("float") or compute_type == "int16":
+        mb *= 2
+    return mb * 1024 * 1024
+
+class _PooledModel:
+    def __init__(self, model: WhisperModel, load_seconds: float, memory_bytes: int, pinned: bool):
+        self.model = model
+        self.load_seconds = load_seconds
+        self.memory_bytes = memory_bytes
+        self.pinned = pinned
+        self.in_use = 0
+        self.uses = 0
+        self.last_used = time.monotonic()
+
+class ModelPool:
+    """
+    Loads each (size, compute type) once and shares the instance between
+    callers. Loads are serialized so concurrent requests never load the same
+    model twice; idle models are evicted when the memory budget is exceeded or
+    after idle_seconds (preloaded models are exempt from the idle timeout).
+    """
+
+    def __init__(
+        self,
+        memory_budget_bytes: int,
+        idle_seconds: float,
+        device: str = "cpu",
+        num_workers: int = 1,
+        cpu_threads: int = 0,  # 0 = CTranslate2's default
+    ):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.idle_seconds = idle_seconds
+        self.device = device
+        self.num_workers = num_workers
+        self.cpu_threads = cpu_threads
+        self._models: "OrderedDict[ModelKey, _PooledModel]" = OrderedDict()
+        self._lock = threading.Lock()       # guards _models
+        self._load_lock = threading.Lock()  # one load at a time
+
+    @contextmanager
+    def acquire(self, model_size: str, compute_type: str):
+        """Check out a loaded model; it can't be evicted until released."""
+        entry = self._checkout((model_size, compute_type))
+        try:
+            yield entry.model
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                entry.last_used = time.monotonic()
+
+    def preload(self, configs: List[ModelKey]):
+        """Load models ahead of time and pin them against the idle timeout."""
+        for key in configs:
+            try:
+                entry = self._checkout(key, pinned=True)
+            except Exception as e:
+                logger.error(f"Failed to preload Whisper model {key}: {e}")
+                continue
+            with self._lock:
+                entry.in_use -= 1
+
+    def evict_idle(self) -> int:
+        """Drop unpinned models that have been idle longer than idle_seconds."""
+        now = time.monotonic()
+        with self._lock:
+            stale = [
+                key for key, entry in self._models.items()
+                if not entry.pinned and entry.in_use == 0 and now - entry.last_used > self.idle_seconds
+            ]
+            for key in stale:
+                self._evict(key)
+        return len(stale)
+
+    def stats(self) -> List[Dict]:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "model_size": key[0],
+                    "compute_type": key[1],
+                    "load_seconds": round(entry.load_seconds, 2),
+                    "memory_mb": round(entry.memory_bytes / (1024 * 1024), 1),
+                    "in_use": entry.in_use,
+                    "uses": entry.uses,
+                    "idle_seconds": round(now - entry.last_used, 1),
+                    "pinned": entry.pinned,
+                }
+                for key, entry in self._models.items()
+            ]
+
+    def _checkout(self, key: ModelKey, pinned: bool = False) -> _PooledModel:
+        self.evict_idle()
+        entry = self._get(key, pinned)
+        if entry is not None:
+            return entry
+
+        with self._load_lock:
+            # Someone may have loaded it while we waited
+            entry = self._get(key, pinned)
+            if entry is not None:
+                return entry
+
+            self._make_room(_approx_bytes(*key))
+            model_size, compute_type = key
+            logger.info(f"Loading Whisper model: {model_size} ({compute_type})...")
+            rss_before = _rss_bytes()
+            started = time.monotonic()
+            model = WhisperModel(
+                model_size, device=self.device, compute_type=compute_type,
+                num_workers=self.num_workers, cpu_threads=self.cpu_threads,
+            )
+            load_seconds = time.monotonic() - started
+            rss_after = _rss_bytes()
+            if rss_before is not None and rss_after is not None and rss_after > rss_before:
+                memory_bytes = rss_after - rss_before
+            else:
+                memory_bytes = _approx_bytes(model_size, compute_type)
+            logger.info(f"Model loaded in {load_seconds:.1f}s (~{memory_bytes / (1024 * 1024):.0f} MB)")
+
+            entry = _PooledModel(model, load_seconds, memory_bytes, pinned)
+            with self._lock:
+                entry.in_use += 1
+                entry.uses += 1
+                self._models[key] = entry
+            return entry
+
+    def _get(self, key: ModelKey, pinned: bool) -> Optional[_PooledModel]:
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is None:
+                return None
+            self._models.move_to_end(key)
+            entry.in_use += 1
+            entry.uses += 1
+            entry.pinned = entry.pinned or pinned
+            return entry
+
+    def _make_room(self, needed_bytes: int):
+        """Evict least-recently-used idle models until the new one fits."""
+        with self._lock:
+            used = sum(entry.memory_bytes for entry in self._models.values())
+            for key in list(self._models):
+                if used + needed_bytes <= self.memory_budget_bytes:
+                    break
+                entry = self._models[key]
+                if entry.in_use == 0:
+                    used -= entry.memory_bytes
+                    self._evict(key)
+        if used + needed_bytes > self.memory_budget_bytes:
+            logger.warning("Whisper model memory budget exceeded; all loaded models are busy")
+
+    def _evict(self, key: ModelKey):
+        entry = self._models.pop(key)
+        logger.info(f"Evicting Whisper model {key[0]} ({key[1]}), ~{entry.memory_bytes / (1024 * 1024):.0f} MB")
+        del entry.model
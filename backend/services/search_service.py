@@ -1,77 +1,159 @@
 # backend/services/search_service.py
 # Semantic search using sentence-transformers (lightweight, no FAISS needed for small datasets)
 
+import base64
+import json
 import logging
-from typing import List, Dict, Any
+import os
+import threading
+from typing import List, Dict, Any, Optional, Tuple
 import re
 
+from services.vector_index import VectorIndex, open_index
+
 logger = logging.getLogger(__name__)
 
+MODEL_NAME = 'all-MiniLM-L6-v2'  # Small, fast model
+
+# Segments this short are not worth searching
+MIN_SEGMENT_CHARS = 20
+
+# Where precomputed segment embeddings are kept, and how they are searched:
+# "flat" (exact) or "ivf" (approximate, for very large libraries)
+INDEX_DIR = os.environ.get("SEARCH_INDEX_DIR", "downloads/index")
+INDEX_BACKEND = os.environ.get("SEARCH_INDEX_BACKEND", "flat")
+
+# Texts per encoder forward pass
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "64"))
+
 # Lazy load the model to avoid slow startup
 _model = None
-_embeddings_cache = {}
+_index = None
+_index_lock = threading.Lock()
 
 def get_model():
     global _model
     if _model is None:
         try:
             from sentence_transformers import SentenceTransformer
-            _model = SentenceTransformer('all-MiniLM-L6-v2')  # Small, fast model
+            _model = SentenceTransformer(MODEL_NAME)
             logger.info("Loaded sentence-transformers model")
         except ImportError:
             logger.warning("sentence-transformers not installed, using keyword search fallback")
             return None
     return _model
 
-def compute_embedding(text: str):
-    """Compute embedding for a piece of text."""
+def get_index() -> VectorIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = open_index(INDEX_DIR, INDEX_BACKEND)
+            logger.info(f"Opened {_index.backend} search index with {len(_index)} segments")
+    return _index
+
+def index_matches_model() -> bool:
+    """False when the index is empty or was built with a different embedding model."""
+    index = get_index()
+    return index.model_name == MODEL_NAME and len(index) > 0
+
+def encode_texts(texts: List[str], batch_size: int = None):
+    """
+    Embed many texts at once. Texts are sorted by length so each batch pads
+    to similar lengths, encoded `batch_size` at a time and returned in the
+    original order as an (n, dim) array. None without sentence-transformers.
+    """
+    import numpy as np
     model = get_model()
     if model is None:
         return None
-    return model.encode(text, convert_to_numpy=True)
+    batch_size = batch_size or EMBED_BATCH_SIZE
+    if not texts:
+        return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    vectors = None
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        encoded = model.encode([texts[i] for i in batch], batch_size=len(batch), convert_to_numpy=True)
+        if vectors is None:
+            vectors = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+        vectors[batch] = encoded
+    return vectors
+
+def index_transcript(project_id: int, segments: List[Dict[str, Any]]) -> Optional[int]:
+    """
+    Embed a transcript's segments (dicts with 'id' and 'text') in one batched
+    pass and add them to the persistent index.
+    Returns how many were indexed, or None without sentence-transformers.
+    """
+    keep = [seg for seg in segments if len(seg.get('text', '')) > MIN_SEGMENT_CHARS]
+    vectors = encode_texts([seg['text'] for seg in keep])
+    if vectors is None:
+        return None
+    if keep:
+        get_index().add([seg['id'] for seg in keep], [project_id] * len(keep), vectors, MODEL_NAME)
+    return len(keep)
+
+def remove_from_index(segment_ids: List[int] = None, project_id: int = None) -> int:
+    """Drop segments (or a whole project) from the index."""
+    if segment_ids is not None and not len(segment_ids):
+        return 0
+    return get_index().remove(segment_ids=segment_ids, project_id=project_id)
+
+def search_index(query: str, top_k: int = 10, segment_ids: List[int] = None) -> Optional[List[Tuple[int, float]]]:
+    """
+    Top-k (segment_id, score) from the precomputed index, optionally only
+    among `segment_ids`. Returns None without sentence-transformers so
+    callers can fall back to keywords.
+    """
+    query_embedding = compute_embedding(query)
+    if query_embedding is None:
+        return None
+    return get_index().search(query_embedding, top_k, segment_ids=segment_ids)
+
+# Rank offset in reciprocal-rank fusion; 60 is the usual choice
+RRF_K = 60
+
+def reciprocal_rank_fusion(rankings: List[List[Tuple[int, float]]], k: int = RRF_K) -> List[Tuple[int, float]]:
+    """
+    Merge best-first (segment_id, score) lists by summing 1 / (k + rank).
+    Only ranks matter, so BM25 and cosine scores need no normalizing.
+    Ties go to the lower segment id.
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, (segment_id, _) in enumerate(ranking, start=1):
+            fused[segment_id] = fused.get(segment_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: (-item[1], item[0]))
+
+def encode_cursor(offset: int, fingerprint: str) -> str:
+    """Opaque cursor for the page starting at `offset` of one query's results."""
+    payload = json.dumps({"o": offset, "q": fingerprint}).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(cursor: str, fingerprint: str) -> int:
+    """Offset a cursor points at. Raises ValueError if it is malformed or from another query."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        offset = int(payload["o"])
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if payload.get("q") != fingerprint or offset < 0:
+        raise ValueError("Cursor does not belong to this query")
+    return offset
+
+def compute_embedding(text: str):
+    """Compute embedding for a piece of text."""
+    vectors = encode_texts([text])
+    return None if vectors is None else vectors[0]
 
 def cosine_similarity(a, b):
     """Compute cosine similarity between two vectors."""
     import numpy as np
     return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
 
-def semantic_search(query: str, documents: List[Dict[str, Any]], top_k: int = 10) -> List[Dict[str, Any]]:
-    """
-    Search documents semantically.
-    Each document should have 'id', 'text', and optionally 'title'.
-    Returns documents sorted by relevance with 'score' field added.
-    """
-    model = get_model()
-    
-    if model is None:
-        # Fallback to keyword search
-        return keyword_search(query, documents, top_k)
-    
-    # Compute query embedding
-    query_embedding = model.encode(query, convert_to_numpy=True)
-    
-    results = []
-    for doc in documents:
-        text = doc.get('text', '')
-        doc_id = doc.get('id')
-        
-        # Use cached embedding or compute new one
-        cache_key = f"{doc_id}_{hash(text[:100])}"
-        if cache_key in _embeddings_cache:
-            doc_embedding = _embeddings_cache[cache_key]
-        else:
-            doc_embedding = model.encode(text, convert_to_numpy=True)
-            _embeddings_cache[cache_key] = doc_embedding
-        
-        score = float(cosine_similarity(query_embedding, doc_embedding))
-        results.append({**doc, 'score': score})
-    
-    # Sort by score descending
-    results.sort(key=lambda x: x['score'], reverse=True)
-    return results[:top_k]
-
 def keyword_search(query: str, documents: List[Dict[str, Any]], top_k: int = 10) -> List[Dict[str, Any]]:
-    """Fallback keyword search when sentence-transformers is not available."""
+    """Term-overlap search over in-memory documents, for SQLite builds without FTS5."""
     query_terms = set(query.lower().split())
     
     results = []
@@ -89,30 +171,26 @@ def keyword_search(query: str, documents: List[Dict[str, Any]], top_k: int = 10)
     results.sort(key=lambda x: x['score'], reverse=True)
     return results[:top_k]
 
-def search_transcripts(query: str, transcripts: List[Dict], top_k: int = 10) -> List[Dict]:
+_FTS_TOKEN = re.compile(r'"([^"]*)"|(\S+)')
+
+def fts_query(query: str) -> Optional[str]:
     """
-    Search across multiple transcripts.
-    Each transcript should have 'project_id', 'title', 'segments'.
-    Returns matching segments with project context.
+    Turn a user query into an FTS5 MATCH expression: "quoted text" is a
+    phrase, a trailing * makes a prefix match, and other words are plain
+    terms. Terms are OR'ed so BM25 ranks segments matching more of them
+    (and rarer ones) first. Returns None if nothing searchable is left.
     """
-    # Flatten segments for searching
-    documents = []
-    for t in transcripts:
-        project_id = t.get('project_id')
-        title = t.get('title', f'Project {project_id}')
-        segments = t.get('segments', [])
-        
-        for i, seg in enumerate(segments):
-            text = seg.get('text', '')
-            if len(text) > 20:  # Skip very short segments
-                documents.append({
-                    'id': f"{project_id}_{i}",
-                    'project_id': project_id,
-                    'title': title,
-                    'segment_index': i,
-                    'text': text,
-                    'start': seg.get('start', 0),
-                    'end': seg.get('end', 0),
-                })
-    
-    return semantic_search(query, documents, top_k)
+    parts = []
+    for phrase, word in _FTS_TOKEN.findall(query):
+        if phrase:
+            words = re.findall(r'\w+', phrase)
+            if words:
+                parts.append('"' + ' '.join(words) + '"')
+            continue
+        prefix = word.endswith('*')
+        words = re.findall(r'\w+', word)
+        if not words:
+            continue
+        term = '"' + ' '.join(words) + '"'
+        parts.append(term + '*' if prefix else term)
+    return ' OR '.join(parts) if parts else None
@@ -1,52 +1,271 @@
-from faster_whisper import WhisperModel
 import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-# Model configuration
-MODEL_SIZE = "base" # Can be tiny, base, small, medium, large-v2
-COMPUTE_TYPE = "int8" # Use int8 for CPU efficiency, float16 for GPU
+from services.chunking import SAMPLE_RATE, split_audio, stitch_segments
+from services.model_pool import ModelPool, MODEL_SIZES, COMPUTE_TYPES
+
+logger = logging.getLogger(__name__)
+
+# Model configuration (defaults; projects can request another size/compute type)
+MODEL_SIZE = os.environ.get("WHISPER_MODEL", "base") # Can be tiny, base, small, medium, large-v2
+COMPUTE_TYPE = os.environ.get("WHISPER_COMPUTE_TYPE", "int8") # Use int8 for CPU efficiency, float16 for GPU
+BEAM_SIZE = 5
+
+# Models loaded at startup, e.g. WHISPER_PRELOAD="base:int8,small:int8"
+PRELOAD_MODELS = os.environ.get("WHISPER_PRELOAD", f"{MODEL_SIZE}:{COMPUTE_TYPE}")
+# Idle models are evicted beyond this budget or after this long unused
+MODEL_MEMORY_BUDGET_MB = int(os.environ.get("WHISPER_MEMORY_BUDGET_MB", 4096))
+MODEL_IDLE_SECONDS = int(os.environ.get("WHISPER_IDLE_SECONDS", 900))
+
+# Parallel mode: long audio is cut at silences and the chunks are transcribed
+# across worker processes, each with its own (budgeted) model pool.
+PARALLEL_WORKERS = int(os.environ.get("TRANSCRIBE_WORKERS", min(4, os.cpu_count() or 1)))
+PARALLEL_MIN_DURATION = 600 # seconds; shorter files aren't worth the split
+CHUNK_SECONDS = 300
+# Model memory budget of each worker process (default: an equal share of WHISPER_MEMORY_BUDGET_MB)
+WORKER_MEMORY_BUDGET_MB = int(os.environ.get(
+    "WHISPER_WORKER_MEMORY_BUDGET_MB", MODEL_MEMORY_BUDGET_MB // max(1, PARALLEL_WORKERS)
+))
+
+# Per-process model pool for pool workers, created by _init_worker
+_worker_pool = None
+
+def _init_worker(cpu_threads: int, memory_budget_mb: int, idle_seconds: int):
+    global _worker_pool
+    _worker_pool = ModelPool(
+        memory_budget_bytes=memory_budget_mb * 1024 * 1024,
+        idle_seconds=idle_seconds,
+        cpu_threads=cpu_threads,
+    )
+
+def _detect_language_chunk(audio, model_size: str, compute_type: str):
+    """Runs in a pool worker: detect the language from the first chunk."""
+    with _worker_pool.acquire(model_size, compute_type) as model:
+        _, info = model.transcribe(audio[:30 * SAMPLE_RATE], beam_size=1)
+    return info.language, info.language_probability, (os.getpid(), _worker_pool.stats())
+
+def _transcribe_chunk(audio, model_size: str, compute_type: str, language: str, beam_size: int):
+    """
+    Runs in a pool worker: transcribe one chunk, timestamps relative to the
+    chunk. Also returns (pid, model stats) of the worker that ran it.
+    """
+    with _worker_pool.acquire(model_size, compute_type) as model:
+        segments, _ = model.transcribe(audio, beam_size=beam_size, language=language)
+        segments = [{"start": s.start, "end": s.end, "text": s.text} for s in segments]
+    return segments, (os.getpid(), _worker_pool.stats())
+
+def parse_model_list(value: str) -> list:
+    """Parse "base:int8,small" into [("base", "int8"), ("small", COMPUTE_TYPE)]."""
+    configs = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        size, _, compute = item.partition(":")
+        configs.append((size, compute or COMPUTE_TYPE))
+    return configs
+
+def validate_model(model_size: str = None, compute_type: str = None):
+    """Raise ValueError for a model size or compute type faster-whisper doesn't know."""
+    if model_size and model_size not in MODEL_SIZES:
+        raise ValueError(f"Unknown model size '{model_size}'. Allowed: {sorted(MODEL_SIZES)}")
+    if compute_type and compute_type not in COMPUTE_TYPES:
+        raise ValueError(f"Unknown compute type '{compute_type}'. Allowed: {sorted(COMPUTE_TYPES)}")
 
 class Transcriber:
-    def __init__(self):
-        # Initialize model on first use or startup
-        # For now, we'll load it lazily or here
-        self.model = None
-
-    def load_model(self):
-        if not self.model:
-            print(f"Loading Whisper model: {MODEL_SIZE}...")
-            self.model = WhisperModel(MODEL_SIZE, device="cpu", compute_type=COMPUTE_TYPE)
-            print("Model loaded.")
-
-    async def transcribe(self, audio_path: str) -> dict:
+    def __init__(self, workers: int = PARALLEL_WORKERS):
+        # Models are shared through a warm pool instead of one lazily loaded instance
+        self.models = ModelPool(
+            memory_budget_bytes=MODEL_MEMORY_BUDGET_MB * 1024 * 1024,
+            idle_seconds=MODEL_IDLE_SECONDS,
+        )
+        self.workers = workers
+        self._pool = None
+        self._worker_stats = {}  # pid -> model stats reported with that worker's last chunk
+
+    def load_model(self, model_size: str = None, compute_type: str = None):
+        """Load a model into the pool ahead of use."""
+        self.models.preload([(model_size or MODEL_SIZE, compute_type or COMPUTE_TYPE)])
+
+    def preload(self):
+        """Load the models configured in WHISPER_PRELOAD."""
+        self.models.preload(parse_model_list(PRELOAD_MODELS))
+
+    def get_pool(self) -> ProcessPoolExecutor:
+        """Worker processes are kept alive so their models stay loaded between jobs."""
+        if self._pool is None:
+            cpu_threads = max(1, (os.cpu_count() or 1) // self.workers)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(cpu_threads, WORKER_MEMORY_BUDGET_MB, MODEL_IDLE_SECONDS),
+            )
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+            self._worker_stats.clear()
+
+    def model_stats(self) -> list:
+        """
+        Models loaded in this process, then those held by parallel-mode
+        worker processes (tagged with "worker", the pid) as of each worker's
+        last chunk.
+        """
+        stats = self.models.stats()
+        for pid, models in sorted(self._worker_stats.items()):
+            stats += [{**model, "worker": pid} for model in models]
+        return stats
+
+    async def transcribe(
+        self,
+        audio_path: str,
+        parallel: bool = None,
+        model_size: str = None,
+        compute_type: str = None,
+        language: str = None,
+    ) -> dict:
         """
         Transcribes audio file using faster-whisper.
         Returns a list of segments with timestamps.
+        parallel: force chunked multi-process mode on/off; by default it is
+        used for files longer than PARALLEL_MIN_DURATION when workers > 1.
+        model_size/compute_type: override the configured defaults.
+        language: skip language detection and decode as this language.
+        """
+        info = {}
+        segments = []
+        async for kind, data in self.transcribe_stream(audio_path, parallel, model_size, compute_type, language):
+            if kind == "info":
+                info = data
+            else:
+                segments.append(data)
+
+        return {
+            "language": info.get("language"),
+            "language_probability": info.get("language_probability"),
+            "segments": segments
+        }
+
+    async def transcribe_stream(
+        self,
+        audio_path: str,
+        parallel: bool = None,
+        model_size: str = None,
+        compute_type: str = None,
+        language: str = None,
+    ):
+        """
+        Async generator version of transcribe().
+        Yields ("info", {"language", "language_probability", "duration"}) once,
+        then ("segment", {"start", "end", "text"}) as each segment is decoded.
         """
-        if not self.model:
-            self.load_model()
+        loop = asyncio.get_event_loop()
+        model_size = model_size or MODEL_SIZE
+        compute_type = compute_type or COMPUTE_TYPE
+
+        if parallel is None:
+            parallel = self.workers > 1
+        if parallel:
+            from faster_whisper.audio import decode_audio
+            audio = await loop.run_in_executor(None, decode_audio, audio_path)
+            if len(audio) / SAMPLE_RATE >= PARALLEL_MIN_DURATION:
+                async for event in self._transcribe_parallel(audio, model_size, compute_type, language):
+                    yield event
+                return
+            audio_input = audio
+        else:
+            audio_input = audio_path
+
+        queue = asyncio.Queue()
+        stop = threading.Event()
 
         def _run_transcribe():
-            segments, info = self.model.transcribe(audio_path, beam_size=5)
-            # Convert generator to list
-            result_segments = []
-            for segment in segments:
-                result_segments.append({
-                    "start": segment.start,
-                    "end": segment.end,
-                    "text": segment.text
-                })
-            return result_segments, info
+            # Runs in a worker thread; hands each segment to the event loop as soon as it is decoded
+            try:
+                with self.models.acquire(model_size, compute_type) as model:
+                    segments, info = model.transcribe(audio_input, beam_size=BEAM_SIZE, language=language)
+                    loop.call_soon_threadsafe(queue.put_nowait, ("info", {
+                        "language": info.language,
+                        "language_probability": info.language_probability,
+                        "duration": info.duration,
+                    }))
+                    for segment in segments:
+                        if stop.is_set():
+                            break
+                        loop.call_soon_threadsafe(queue.put_nowait, ("segment", {
+                            "start": segment.start,
+                            "end": segment.end,
+                            "text": segment.text
+                        }))
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, ("error", e))
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, None)
 
         # Run blocking transcription in a separate thread
+        worker = loop.run_in_executor(None, _run_transcribe)
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                if event[0] == "error":
+                    raise event[1]
+                yield event
+        finally:
+            stop.set()
+            await asyncio.shield(worker)
+
+    async def _transcribe_parallel(self, audio, model_size: str, compute_type: str, language: str = None):
         loop = asyncio.get_event_loop()
-        segments, info = await loop.run_in_executor(None, _run_transcribe)
+        pool = self.get_pool()
 
-        return {
-            "language": info.language,
-            "language_probability": info.language_probability,
-            "segments": segments
+        chunks = split_audio(audio, SAMPLE_RATE, chunk_seconds=CHUNK_SECONDS)
+        logger.info(f"Parallel transcription: {len(chunks)} chunks across {self.workers} workers")
+
+        # Detect once so every chunk decodes in the same language
+        if language:
+            probability = 1.0
+        else:
+            language, probability, (pid, stats) = await loop.run_in_executor(
+                pool, _detect_language_chunk, chunks[0][1], model_size, compute_type
+            )
+            self._worker_stats[pid] = stats
+        yield "info", {
+            "language": language,
+            "language_probability": probability,
+            "duration": len(audio) / SAMPLE_RATE,
         }
 
+        futures = [
+            loop.run_in_executor(pool, _transcribe_chunk, samples, model_size, compute_type, language, BEAM_SIZE)
+            for _, samples in chunks
+        ]
+        try:
+            # Chunks run concurrently but are emitted in order; stitching a new
+            # chunk never changes segments that were already emitted
+            done = []
+            emitted = 0
+            for (offset, _), future in zip(chunks, futures):
+                segments, (pid, stats) = await future
+                self._worker_stats[pid] = stats
+                done.append((offset, segments))
+                stitched = stitch_segments(done)
+                for segment in stitched[emitted:]:
+                    yield "segment", segment
+                emitted = len(stitched)
+        finally:
+            for future in futures:
+                future.cancel()
+
 # Global instance
 transcriber = Transcriber()
@@ -0,0 +1,101 @@
+# backend/services/transcript_cache.py
+# In-process LRU cache of decoded transcript segment lists
+
+import os
+import sys
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Memory budget for cached segment lists (override with TRANSCRIPT_CACHE_MB)
+DEFAULT_MAX_MB = 256
+
+# Rough per-segment overhead of a {"start", "end", "text"} dict beyond the text itself
+_SEGMENT_OVERHEAD = 400
+
+def estimate_size(segments: list) -> int:
+    """Approximate memory footprint of a segment list in bytes."""
+    size = sys.getsizeof(segments)
+    for seg in segments:
+        size += _SEGMENT_OVERHEAD + len(seg.get('text', ''))
+    return size
+
+class TranscriptCache:
+    """
+    LRU cache of segment lists keyed by transcript id.
+    Each entry remembers the transcript version it was decoded from, so a
+    bumped version is a miss. Cached lists are shared: treat them as read-only.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[int, Tuple[int, list, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, transcript_id: int, version: int) -> Optional[list]:
+        with self._lock:
+            entry = self._entries.get(transcript_id)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(transcript_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, transcript_id: int, version: int, segments: list):
+        size = estimate_size(segments)
+        if size > self.max_bytes:
+            return  # Never cache something that would evict everything else
+
+        with self._lock:
+            self._remove(transcript_id)
+            self._entries[transcript_id] = (version, segments, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, transcript_id: int):
+        with self._lock:
+            self._remove(transcript_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def _remove(self, transcript_id: int):
+        entry = self._entries.pop(transcript_id, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+def _max_bytes_from_env() -> int:
+    try:
+        return int(float(os.environ.get("TRANSCRIPT_CACHE_MB", DEFAULT_MAX_MB)) * 1024 * 1024)
+    except ValueError:
+        logger.warning("Invalid TRANSCRIPT_CACHE_MB, using default")
+        return DEFAULT_MAX_MB * 1024 * 1024
+
+# Global instance
+transcript_cache = TranscriptCache(_max_bytes_from_env())
@@ -1,9 +1,25 @@
 import argostranslate.package
 import argostranslate.translate
+import hashlib
 import logging
+import os
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
+# Segments per CTranslate2 batch, and batches translated at once
+TRANSLATE_BATCH_SIZE = int(os.environ.get("TRANSLATE_BATCH_SIZE", "32"))
+TRANSLATE_WORKERS = int(os.environ.get("TRANSLATE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+class TranslationError(Exception):
+    """A text could not be translated (e.g. no package for the language pair)."""
+
+_engines = {}
+_engines_lock = threading.Lock()
+_pool = None
+
 def install_languages():
     """Install English to Spanish/French/German packages by default"""
     logger.info("Updating package index...")
@@ -22,8 +38,11 @@ def install_languages():
         argostranslate.package.install_from_path(package_to_install.download())
         logger.info("Installation complete.")
 
-def translate_text(text, from_code="en", to_code="es"):
-    """Translate text using installed packages"""
+def translate_text(text, from_code="en", to_code="es", strict=False):
+    """
+    Translate text using installed packages. On failure the text is
+    returned unchanged, or TranslationError raised if `strict`.
+    """
     try:
         # Auto-install if needed (simplified for MVP)
         # In prod, check installed_packages first
@@ -32,13 +51,157 @@ def translate_text(text, from_code="en", to_code="es"):
         return translation
     except Exception as e:
         logger.error(f"Translation error: {e}")
+        if strict:
+            raise TranslationError(f"Cannot translate {from_code} -> {to_code}: {e}") from e
         return text
 
-def translate_segments(segments, target_lang="es"):
-    """Translate a list of transcript segments"""
-    translated_segments = []
-    for seg in segments:
-        new_seg = seg.copy()
-        new_seg['text'] = translate_text(seg['text'], "en", target_lang)
-        translated_segments.append(new_seg)
+class _BatchEngine:
+    """
+    The CTranslate2 model and tokenizer of an installed argos package,
+    driven directly so many segments go through one translate_batch call.
+    """
+
+    def __init__(self, pkg):
+        import ctranslate2
+        from argostranslate import settings
+
+        self.translator = ctranslate2.Translator(
+            str(pkg.package_path / "model"),
+            device=getattr(settings, "device", "cpu"),
+            inter_threads=TRANSLATE_WORKERS,
+        )
+        self.target_prefix = getattr(pkg, "target_prefix", "") or ""
+        tokenizer = getattr(pkg, "tokenizer", None)
+        if tokenizer is not None:
+            self.encode, self.decode = tokenizer.encode, tokenizer.decode
+        else:
+            import sentencepiece
+            sp = sentencepiece.SentencePieceProcessor(model_file=str(pkg.package_path / "sentencepiece.model"))
+            self.encode = lambda text: sp.encode(text, out_type=str)
+            self.decode = lambda tokens: sp.decode(tokens)
+
+    def translate(self, texts):
+        tokenized = [self.encode(text) for text in texts]
+        kwargs = {}
+        if self.target_prefix:
+            kwargs["target_prefix"] = [[self.target_prefix]] * len(tokenized)
+        results = self.translator.translate_batch(
+            tokenized,
+            replace_unknowns=True,
+            max_batch_size=len(tokenized),
+            beam_size=4,
+            length_penalty=0.2,
+            **kwargs,
+        )
+        translated = []
+        for result in results:
+            value = self.decode(result.hypotheses[0])
+            if self.target_prefix and value.startswith(self.target_prefix):
+                value = value[len(self.target_prefix):]
+            translated.append(value.strip())
+        return translated
+
+def _get_engine(from_code, to_code):
+    """Batch engine for a direct language pair, or None (pivot pairs, older argos)."""
+    key = (from_code, to_code)
+    with _engines_lock:
+        if key not in _engines:
+            engine = None
+            try:
+                pkg = next(
+                    p for p in argostranslate.package.get_installed_packages()
+                    if p.from_code == from_code and p.to_code == to_code
+                )
+                engine = _BatchEngine(pkg)
+                logger.info(f"Loaded batch translation model {from_code}->{to_code}")
+            except StopIteration:
+                logger.info(f"No direct {from_code}->{to_code} package, translating segment by segment")
+            except Exception as e:
+                logger.warning(f"Batch translation unavailable for {from_code}->{to_code}: {e}")
+            _engines[key] = engine
+        return _engines[key]
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=TRANSLATE_WORKERS, thread_name_prefix="translate")
+    return _pool
+
+def translate_texts(texts, from_code="en", to_code="es"):
+    """
+    Translate many short texts (e.g. transcript segments), in order.
+    Texts are grouped into batches of TRANSLATE_BATCH_SIZE and the batches
+    run across TRANSLATE_WORKERS threads (CTranslate2 releases the GIL).
+    Raises TranslationError if any text cannot be translated.
+    """
+    if not texts:
+        return []
+    engine = _get_engine(from_code, to_code)
+    if engine is None:
+        return list(_get_pool().map(lambda text: translate_text(text, from_code, to_code, strict=True), texts))
+
+    # Similar lengths in a batch means less padding
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    batches = [order[i:i + TRANSLATE_BATCH_SIZE] for i in range(0, len(order), TRANSLATE_BATCH_SIZE)]
+
+    def run(batch):
+        try:
+            return engine.translate([texts[i] for i in batch])
+        except Exception as e:
+            logger.error(f"Batch translation error: {e}")
+            return [translate_text(texts[i], from_code, to_code, strict=True) for i in batch]
+
+    translated = [None] * len(texts)
+    for batch, results in zip(batches, _get_pool().map(run, batches)):
+        for i, text in zip(batch, results):
+            translated[i] = text
+    return translated
+
+def normalize_text(text):
+    """Text as compared by the translation memory: NFC, whitespace collapsed."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+def text_hash(text):
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+def model_version(from_code="en", to_code="es"):
+    """
+    Identifies the installed model(s) for a language pair, so translation
+    memory entries are not reused across model upgrades.
+    """
+    packages = {(p.from_code, p.to_code): p for p in argostranslate.package.get_installed_packages()}
+    direct = (from_code, to_code) in packages or "en" in (from_code, to_code)
+    legs = [(from_code, to_code)] if direct else [(from_code, "en"), ("en", to_code)]
+    return "argos:" + ",".join(
+        f"{a}-{b}@{getattr(packages[(a, b)], 'package_version', '?')}" if (a, b) in packages else f"{a}-{b}@?"
+        for a, b in legs
+    )
+
+def translate_segments(segments, target_lang="es", source_lang="en", memory=None):
+    """
+    Translate a list of transcript segments, keeping their timing.
+    `memory` maps text_hash() of source texts to known translations: hits
+    are not translated again, and new translations are added to it.
+    Repeated texts within the segments are translated once.
+    Raises TranslationError (leaving `memory` untouched) if any segment fails.
+    """
+    memory = {} if memory is None else memory
+    hashes = {}
+    pending = {}
+    for i, seg in enumerate(segments):
+        if not seg.get('text', '').strip():
+            continue
+        key = text_hash(seg['text'])
+        hashes[i] = key
+        if key not in memory and key not in pending:
+            pending[key] = normalize_text(seg['text'])
+
+    if pending:
+        logger.info(f"Translating {len(pending)} of {len(hashes)} segments ({len(hashes) - len(pending)} from memory)")
+        translations = translate_texts(list(pending.values()), source_lang, target_lang)
+        memory.update(zip(pending.keys(), translations))
+
+    translated_segments = [seg.copy() for seg in segments]
+    for i, key in hashes.items():
+        translated_segments[i]['text'] = memory[key]
     return translated_segments
@@ -1,11 +1,34 @@
 # Text-to-Speech (TTS) Dubbing Service
-# Uses edge-tts (free Microsoft Edge TTS) for voice synthesis
+# Uses edge-tts (free Microsoft Edge TTS) for voice synthesis, or a local
+# stand-in (TTS_BACKEND=tone) for offline runs and tests
 import logging
 import os
 import asyncio
+import hashlib
+import re
+import shutil
+import uuid
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Segments synthesized at once, and where synthesized speech is cached
+TTS_CONCURRENCY = int(os.environ.get("TTS_CONCURRENCY", "8"))
+TTS_CACHE_DIR = os.environ.get("TTS_CACHE_DIR", "downloads/tts_cache")
+# Speech longer than its slot is sped up by at most this factor to stay in sync
+DUB_MAX_SPEEDUP = float(os.environ.get("DUB_MAX_SPEEDUP", "1.6"))
+# Mono PCM rate dubs are assembled at (edge-tts produces 24 kHz)
+DUB_SAMPLE_RATE = 24000
+# Aligned dubs are mixed and piped to the encoder this many samples at a time
+DUB_MIX_BLOCK = DUB_SAMPLE_RATE * 10
+# Continuous dubs are synthesized in chunks of whole sentences up to this many characters
+TTS_CHUNK_CHARS = int(os.environ.get("TTS_CHUNK_CHARS", "1500"))
+# edge (Microsoft Edge neural voices) or tone (local stand-in: a beep per sentence, no network)
+TTS_BACKEND = os.environ.get("TTS_BACKEND", "edge")
+
+_pending = {}  # cache path -> synthesis task
+
 # Voice options
 VOICES = {
     "en": {
@@ -30,67 +53,323 @@ VOICES = {
     }
 }
 
+def get_voice(lang: str = "en", gender: str = "female") -> str:
+    return VOICES.get(lang, VOICES["en"]).get(gender, VOICES["en"]["female"])
+
+async def _edge_tts(text: str, voice: str, output_path: str):
+    import edge_tts
+    communicate = edge_tts.Communicate(text, voice)
+    await communicate.save(output_path)
+
+async def _tone_tts(text: str, voice: str, output_path: str):
+    """Stand-in voice: a tone as long as the text would take to read (~15 chars/s)."""
+    seconds = max(0.3, len(text) / 15)
+    frequency = 200 + int(hashlib.md5(voice.encode()).hexdigest(), 16) % 400
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-v", "error", "-y",
+        "-f", "lavfi", "-i", f"sine=frequency={frequency}:duration={seconds:.2f}:sample_rate={DUB_SAMPLE_RATE}",
+        # Bare MP3 frames like edge-tts, so chunk files concatenate cleanly
+        "-ac", "1", "-c:a", "libmp3lame", "-b:a", "48k", "-write_xing", "0", "-id3v2_version", "0",
+        "-f", "mp3", output_path,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    _, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(stderr.decode(errors="replace").strip())
+
+TTS_BACKENDS = {"edge": _edge_tts, "tone": _tone_tts}
+
 async def text_to_speech(text: str, output_path: str, lang: str = "en", gender: str = "female"):
     """
-    Convert text to speech using edge-tts.
+    Convert text to speech using edge-tts (or the TTS_BACKEND stand-in).
     Returns the path to the generated audio file.
     """
-    try:
-        import edge_tts
-    except ImportError:
-        logger.error("edge-tts not installed. Run: pip install edge-tts")
-        return None
+    if TTS_BACKEND == "edge":
+        try:
+            import edge_tts
+        except ImportError:
+            logger.error("edge-tts not installed. Run: pip install edge-tts")
+            return None
     
     # Get voice
-    voice = VOICES.get(lang, VOICES["en"]).get(gender, VOICES["en"]["female"])
+    voice = get_voice(lang, gender)
     
     try:
         logger.info(f"Generating TTS for {len(text)} characters using {voice}...")
-        communicate = edge_tts.Communicate(text, voice)
-        await communicate.save(output_path)
+        await TTS_BACKENDS.get(TTS_BACKEND, _edge_tts)(text, voice, output_path)
         logger.info(f"TTS audio saved to {output_path}")
         return output_path
     except Exception as e:
         logger.error(f"TTS error: {e}")
         return None
 
+def tts_cache_path(text: str, voice: str) -> str:
+    key = hashlib.sha256(f"{TTS_BACKEND}:{voice}\n{text}".encode("utf-8")).hexdigest()
+    return os.path.join(TTS_CACHE_DIR, key[:2], f"{key}.mp3")
+
+async def cached_text_to_speech(text: str, lang: str = "en", gender: str = "female"):
+    """
+    text_to_speech through a disk cache keyed by hash(text, voice), so
+    unchanged segments are never synthesized twice. Returns the cached path.
+    """
+    path = tts_cache_path(text, get_voice(lang, gender))
+    if os.path.exists(path):
+        return path
+    # Repeated texts in flight at the same time are synthesized once
+    if path not in _pending:
+        _pending[path] = asyncio.ensure_future(_synthesize_to_cache(text, path, lang, gender))
+        _pending[path].add_done_callback(lambda _: _pending.pop(path, None))
+    return await asyncio.shield(_pending[path])
+
+async def _synthesize_to_cache(text: str, path: str, lang: str, gender: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        if not await text_to_speech(text, tmp, lang, gender):
+            return None
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return path
+
+async def synthesize_segments(segments, lang: str = "en", gender: str = "female"):
+    """
+    Speech for every non-empty segment, TTS_CONCURRENCY at a time, as
+    {segment_index, start, end, audio_path} with paths into the TTS cache.
+    """
+    limit = asyncio.Semaphore(TTS_CONCURRENCY)
+
+    async def synthesize(i, seg):
+        text = seg.get('text', '').strip()
+        if not text:
+            return None
+        async with limit:
+            audio_path = await cached_text_to_speech(text, lang, gender)
+        if not audio_path:
+            return None
+        return {
+            "segment_index": i,
+            "start": seg.get('start', 0),
+            "end": seg.get('end', 0),
+            "audio_path": audio_path
+        }
+
+    results = await asyncio.gather(*(synthesize(i, seg) for i, seg in enumerate(segments)))
+    return [result for result in results if result]
+
 async def generate_dubbed_segments(segments, output_dir: str, lang: str = "en", gender: str = "female"):
     """
     Generate individual TTS audio files for each transcript segment.
     Returns a list of audio file paths.
     """
     os.makedirs(output_dir, exist_ok=True)
-    audio_files = []
-    
-    for i, seg in enumerate(segments):
-        text = seg.get('text', '').strip()
-        if not text:
-            continue
-        
-        output_path = os.path.join(output_dir, f"segment_{i:04d}.mp3")
-        result = await text_to_speech(text, output_path, lang, gender)
-        if result:
-            audio_files.append({
-                "segment_index": i,
-                "start": seg.get('start', 0),
-                "end": seg.get('end', 0),
-                "audio_path": result
-            })
-    
+    audio_files = await synthesize_segments(segments, lang, gender)
+    for audio_file in audio_files:
+        output_path = os.path.join(output_dir, f"segment_{audio_file['segment_index']:04d}.mp3")
+        shutil.copyfile(audio_file["audio_path"], output_path)
+        audio_file["audio_path"] = output_path
     return audio_files
 
+async def _ffmpeg_pcm(args: list, input_bytes: bytes = None) -> np.ndarray:
+    """Run ffmpeg with `args` (input options and filters) and return its mono float32 PCM output."""
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-v", "error", *args,
+        "-f", "f32le", "-ac", "1", "-ar", str(DUB_SAMPLE_RATE), "-",
+        stdin=asyncio.subprocess.PIPE if input_bytes is not None else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await process.communicate(input_bytes)
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(stdout, dtype=np.float32)
+
+def atempo_chain(factor: float) -> str:
+    """atempo filters for a speed factor (each atempo stage takes 0.5 - 2.0)."""
+    stages = []
+    while factor > 2.0:
+        stages.append(2.0)
+        factor /= 2.0
+    stages.append(factor)
+    return ",".join(f"atempo={stage:.4f}" for stage in stages)
+
+async def _fit_clip(audio_path: str, slot: float) -> np.ndarray:
+    """Decode one segment's speech, sped up (at most DUB_MAX_SPEEDUP) if it is longer than its slot."""
+    samples = await _ffmpeg_pcm(["-i", audio_path])
+    length = len(samples) / DUB_SAMPLE_RATE
+    if slot > 0 and length > slot * 1.02:
+        factor = min(length / slot, DUB_MAX_SPEEDUP)
+        samples = await _ffmpeg_pcm(
+            ["-f", "f32le", "-ac", "1", "-ar", str(DUB_SAMPLE_RATE), "-i", "-", "-filter:a", atempo_chain(factor)],
+            samples.tobytes(),
+        )
+    return samples
+
+async def assemble_dub(audio_files: list, output_path: str, total_duration: float = 0):
+    """
+    Place each segment's speech at its segment's start on one track and
+    encode it to `output_path`. Speech runs until the next segment starts,
+    and is time-stretched to fit when it would run past that.
+    The track is mixed DUB_MIX_BLOCK samples at a time and piped to the
+    encoder; only clips around the current block are held in memory.
+    """
+    audio_files = sorted(audio_files, key=lambda f: f["start"])
+    slots = [
+        (audio_files[i + 1]["start"] if i + 1 < len(audio_files) else max(f["end"], total_duration)) - f["start"]
+        for i, f in enumerate(audio_files)
+    ]
+    offsets = [int(round(f["start"] * DUB_SAMPLE_RATE)) for f in audio_files]
+
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-v", "error", "-y",
+        "-f", "f32le", "-ac", "1", "-ar", str(DUB_SAMPLE_RATE), "-i", "-",
+        "-c:a", "libmp3lame", "-b:a", "64k", output_path,
+        stdin=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    stderr = asyncio.ensure_future(process.stderr.read())
+    pending = []  # (offset, fit task) decoded ahead of the mix position, in start order
+    active = []   # (offset, samples) not yet fully mixed
+    queued = 0
+    try:
+        end = int(total_duration * DUB_SAMPLE_RATE)
+        position = 0
+        while position < end or pending or queued < len(audio_files):
+            # Up to TTS_CONCURRENCY clips are decoded ahead
+            while queued < len(audio_files) and len(pending) < TTS_CONCURRENCY:
+                f = audio_files[queued]
+                pending.append((offsets[queued], asyncio.ensure_future(_fit_clip(f["audio_path"], slots[queued]))))
+                queued += 1
+            block_end = position + DUB_MIX_BLOCK
+            if pending and pending[0][0] < block_end:
+                offset, task = pending.pop(0)
+                samples = await task
+                active.append((offset, samples))
+                end = max(end, offset + len(samples))
+                continue  # until every clip starting in this block is decoded
+            if not pending:
+                block_end = min(block_end, end)
+
+            block = np.zeros(block_end - position, dtype=np.float32)
+            for offset, samples in active:
+                lo, hi = max(offset, position), min(offset + len(samples), block_end)
+                if lo < hi:
+                    block[lo - position:hi - position] += samples[lo - offset:hi - offset]
+            np.clip(block, -1.0, 1.0, out=block)
+            active = [(offset, samples) for offset, samples in active if offset + len(samples) > block_end]
+            process.stdin.write(block.tobytes())
+            await process.stdin.drain()
+            position = block_end
+        process.stdin.close()
+        await process.wait()
+    except BaseException as e:
+        for _, task in pending:
+            task.cancel()
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        if not isinstance(e, (BrokenPipeError, ConnectionResetError)):
+            raise
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {(await stderr).decode(errors='replace').strip()}")
+    return output_path
+
+async def generate_aligned_dub(segments, output_path: str, lang: str = "en", gender: str = "female", total_duration: float = 0):
+    """
+    Dub that stays in sync with the video: every segment is synthesized
+    (concurrently, cached) and placed at its start time.
+    """
+    try:
+        audio_files = await synthesize_segments(segments, lang, gender)
+        if not audio_files:
+            logger.warning("No text to generate TTS for")
+            return None
+        logger.info(f"Assembling {len(audio_files)} dubbed segments into {output_path}")
+        return await assemble_dub(audio_files, output_path, total_duration)
+    except Exception as e:
+        logger.error(f"Dub assembly failed: {e}")
+        return None
+
+SENTENCE_END = re.compile(r"(?<=[.!?。！？])\s+")
+
+def split_text(text: str, max_chars: int = TTS_CHUNK_CHARS) -> list:
+    """
+    Split text into chunks of whole sentences, each at most max_chars
+    (a single longer sentence is split on word boundaries).
+    """
+    chunks, current = [], ""
+    for sentence in SENTENCE_END.split(text.strip()):
+        pieces = [sentence]
+        if len(sentence) > max_chars:
+            pieces, piece = [], ""
+            for word in sentence.split():
+                if piece and len(piece) + 1 + len(word) > max_chars:
+                    pieces.append(piece)
+                    piece = word
+                else:
+                    piece = f"{piece} {word}" if piece else word
+            if piece:
+                pieces.append(piece)
+        for piece in pieces:
+            if current and len(current) + 1 + len(piece) > max_chars:
+                chunks.append(current)
+                current = piece
+            else:
+                current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+async def iter_full_dub(segments, lang: str = "en", gender: str = "female", chunk_size: int = 64 * 1024):
+    """
+    Read the whole transcript continuously: the text is split into
+    sentence chunks synthesized TTS_CONCURRENCY at a time, and the MP3
+    bytes are yielded in order as soon as each chunk (and all before it)
+    is ready, so playback can start early.
+    """
+    full_text = " ".join([seg.get('text', '').strip() for seg in segments]).strip()
+    chunks = split_text(full_text) if full_text else []
+    limit = asyncio.Semaphore(TTS_CONCURRENCY)
+
+    async def synthesize(chunk):
+        async with limit:
+            return await cached_text_to_speech(chunk, lang, gender)
+
+    tasks = [asyncio.ensure_future(synthesize(chunk)) for chunk in chunks]
+    try:
+        for i, task in enumerate(tasks):
+            path = await task
+            if not path:
+                raise RuntimeError(f"TTS failed for chunk {i + 1} of {len(tasks)}")
+            # MP3 is a sequence of frames: chunks play back-to-back when concatenated
+            with open(path, "rb") as f:
+                while data := f.read(chunk_size):
+                    yield data
+    finally:
+        for task in tasks:
+            task.cancel()
+
 async def generate_full_dub(segments, output_path: str, lang: str = "en", gender: str = "female"):
     """
     Generate a single TTS audio file from all transcript segments.
     """
-    # Combine all text
-    full_text = " ".join([seg.get('text', '').strip() for seg in segments])
-    
-    if not full_text:
+    if not any(seg.get('text', '').strip() for seg in segments):
         logger.warning("No text to generate TTS for")
         return None
     
-    return await text_to_speech(full_text, output_path, lang, gender)
+    tmp = f"{output_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            async for data in iter_full_dub(segments, lang, gender):
+                f.write(data)
+        os.replace(tmp, output_path)
+        return output_path
+    except Exception as e:
+        logger.error(f"TTS error: {e}")
+        return None
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
 
 def get_available_voices():
     """Return list of available voices by language"""
@@ -0,0 +1,424 @@
+# backend/services/vector_index.py
+# Persistent vector indexes: a contiguous float32 matrix on disk, memory-mapped for search.
+# "flat" scores every row exactly; "ivf" clusters rows and only scores the closest clusters.
+
+import os
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rewrite the files once this fraction of rows has been deleted
+COMPACT_RATIO = 0.25
+
+# IVF tuning (SEARCH_IVF_NPROBE trades recall for speed at query time)
+IVF_NPROBE = int(os.environ.get("SEARCH_IVF_NPROBE", "16"))
+IVF_MIN_TRAIN_ROWS = int(os.environ.get("SEARCH_IVF_MIN_ROWS", "20000"))
+IVF_RETRAIN_FACTOR = 4   # re-cluster once the index is this many times bigger than when trained
+IVF_TRAIN_SAMPLE = 65536
+IVF_TRAIN_ITERATIONS = 10
+
+class VectorIndex:
+    """
+    Exact ("flat") append-only store of L2-normalized embeddings.
+
+    Files in `directory`:
+      vectors.f32   - N x dim float32 matrix, row-major, memory-mapped for search
+      ids.i64       - segment id per row (-1 once deleted)
+      projects.i64  - project id per row
+      meta.json     - model name and dimension
+
+    Scoring is a single matrix-vector product over the matrix followed by an
+    argpartition top-k, so latency grows linearly with rows but with no
+    Python-level per-row work.
+    """
+
+    backend = "flat"
+
+    # Per-row side arrays, appended alongside the matrix
+    ROW_FIELDS: Dict[str, type] = {"ids": np.int64, "projects": np.int64}
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self.model_name: Optional[str] = None
+        self.dim: Optional[int] = None
+        self._meta: dict = {}
+        self._load()
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.directory / "vectors.f32"
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.directory / "meta.json"
+
+    @staticmethod
+    def _field_file(name: str, dtype) -> str:
+        dtype = np.dtype(dtype)
+        return f"{name}.{dtype.kind}{dtype.itemsize * 8}"  # e.g. ids.i64
+
+    def _field_path(self, name: str) -> Path:
+        return self.directory / self._field_file(name, self.ROW_FIELDS[name])
+
+    @property
+    def _ids(self) -> np.ndarray:
+        return self._rows["ids"]
+
+    @property
+    def _projects(self) -> np.ndarray:
+        return self._rows["projects"]
+
+    def _empty_rows(self) -> Dict[str, np.ndarray]:
+        return {name: np.zeros(0, dtype=dtype) for name, dtype in self.ROW_FIELDS.items()}
+
+    def _load(self):
+        self._rows = self._empty_rows()
+        self._vectors = None
+        if not self._meta_path.exists():
+            return
+
+        self._meta = json.loads(self._meta_path.read_text())
+        self.model_name = self._meta.get("model")
+        self.dim = self._meta.get("dim")
+        if self._meta.get("backend", "flat") != self.backend:
+            self._convert()
+
+        rows = {}
+        for name, dtype in self.ROW_FIELDS.items():
+            path = self._field_path(name)
+            if path.exists():
+                rows[name] = np.fromfile(path, dtype=dtype)
+            elif name in VectorIndex.ROW_FIELDS:
+                rows[name] = np.zeros(0, dtype=dtype)
+            else:
+                # Field this backend adds to an existing index; filled in by the subclass
+                rows[name] = np.full(len(rows["ids"]), -1, dtype=dtype)
+                rows[name].tofile(path)
+        vector_rows = self._vectors_path.stat().st_size // (4 * self.dim) if self._vectors_path.exists() else 0
+
+        # A crash mid-append can leave the files out of step; keep the common prefix
+        counts = [len(a) for a in rows.values()] + [vector_rows]
+        count = min(counts)
+        if any(c != count for c in counts):
+            logger.warning(f"Search index files out of step, truncating to {count} rows")
+            self._truncate(count)
+        self._rows = {name: np.array(a[:count]) for name, a in rows.items()}
+        self._remap()
+
+    def _convert(self):
+        """Keep the vectors of an index built with another backend, dropping its extra files."""
+        logger.info(f"Converting search index at {self.directory} from {self._meta.get('backend', 'flat')} to {self.backend}")
+        shared = {self._vectors_path.name, self._meta_path.name} | {
+            self._field_file(name, dtype) for name, dtype in VectorIndex.ROW_FIELDS.items()
+        }
+        for path in self.directory.iterdir():
+            if path.name not in shared:
+                path.unlink()
+        self._meta = {}
+        self._save_meta()
+
+    def _truncate(self, count: int):
+        paths = [(self._field_path(name), np.dtype(dtype).itemsize) for name, dtype in self.ROW_FIELDS.items()]
+        for path, width in paths + [(self._vectors_path, 4 * self.dim)]:
+            if path.exists():
+                with open(path, "r+b") as f:
+                    f.truncate(count * width)
+
+    def _remap(self):
+        count = len(self._ids)
+        if count and self.dim:
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(count, self.dim))
+        else:
+            self._vectors = None
+
+    def _save_meta(self):
+        self._meta.update({"backend": self.backend, "model": self.model_name, "dim": self.dim})
+        tmp = self._meta_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._meta))
+        os.replace(tmp, self._meta_path)
+
+    def reset(self, model_name: str, dim: int):
+        """Drop everything (e.g. the embedding model changed)."""
+        with self._lock:
+            self._vectors = None
+            for path in [self._vectors_path] + [self._field_path(name) for name in self.ROW_FIELDS]:
+                if path.exists():
+                    path.unlink()
+            self.model_name = model_name
+            self.dim = dim
+            self._meta = {}
+            self._save_meta()
+            self._rows = self._empty_rows()
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._ids >= 0))
+
+    def _extra_fields(self, vectors: np.ndarray) -> Dict[str, np.ndarray]:
+        """Values of subclass-specific row fields for newly added vectors."""
+        return {}
+
+    def add(self, segment_ids: Sequence[int], project_ids: Sequence[int], vectors: np.ndarray, model_name: str):
+        """Append embeddings. Re-adding a segment id replaces its old row."""
+        if len(segment_ids) == 0:
+            return
+        vectors = np.array(vectors, dtype=np.float32, order="C")
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.maximum(norms, 1e-12)
+
+        with self._lock:
+            if self.dim != vectors.shape[1] or self.model_name != model_name:
+                if len(self._ids):
+                    logger.warning(f"Embedding model changed to {model_name}, rebuilding search index")
+                self.reset(model_name, vectors.shape[1])
+
+            self.remove(segment_ids=segment_ids)
+            new_rows = {
+                "ids": np.asarray(segment_ids, dtype=np.int64),
+                "projects": np.asarray(project_ids, dtype=np.int64),
+                **self._extra_fields(vectors),
+            }
+            with open(self._vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+            for name, dtype in self.ROW_FIELDS.items():
+                data = new_rows[name].astype(dtype, copy=False)
+                with open(self._field_path(name), "ab") as f:
+                    f.write(data.tobytes())
+                self._rows[name] = np.concatenate([self._rows[name], data])
+            self._remap()
+            self._after_add(len(vectors))
+
+    def _after_add(self, added: int):
+        pass
+
+    def remove(self, segment_ids: Sequence[int] = None, project_id: int = None) -> int:
+        """Tombstone rows by segment id or project; compacts when enough are dead."""
+        with self._lock:
+            if segment_ids is not None:
+                dead = np.isin(self._ids, np.asarray(segment_ids, dtype=np.int64)) & (self._ids >= 0)
+            elif project_id is not None:
+                dead = (self._projects == project_id) & (self._ids >= 0)
+            else:
+                return 0
+            count = int(np.count_nonzero(dead))
+            if not count:
+                return 0
+
+            self._ids[dead] = -1
+            rows = np.flatnonzero(dead)
+            ids_file = np.memmap(self._field_path("ids"), dtype=np.int64, mode="r+", shape=(len(self._ids),))
+            ids_file[rows] = -1
+            ids_file.flush()
+            del ids_file
+
+            if np.count_nonzero(self._ids < 0) > COMPACT_RATIO * len(self._ids):
+                self._compact()
+            return count
+
+    def _rewrite(self, vectors: np.ndarray, rows: Dict[str, np.ndarray]):
+        """Atomically replace the matrix and side arrays."""
+        self._vectors = None
+        files = [(self._vectors_path, vectors)] + [(self._field_path(name), rows[name]) for name in self.ROW_FIELDS]
+        for path, data in files:
+            tmp = path.with_suffix(path.suffix + ".tmp")
+            data.tofile(tmp)
+            os.replace(tmp, path)
+        self._rows = rows
+        self._remap()
+
+    def _compact(self):
+        live = self._ids >= 0
+        vectors = np.array(self._vectors[live]) if self._vectors is not None else np.zeros((0, self.dim), np.float32)
+        self._rewrite(vectors, {name: a[live] for name, a in self._rows.items()})
+        logger.info(f"Compacted search index to {len(self._ids)} rows")
+
+    def _candidate_rows(self, query: np.ndarray) -> Optional[np.ndarray]:
+        """Rows worth scoring for a query; None means all of them."""
+        return None
+
+    def search(self, query_vector: np.ndarray, top_k: int = 10, segment_ids: Sequence[int] = None) -> List[Tuple[int, float]]:
+        """
+        Top-k (segment_id, cosine score) for a query embedding. With
+        `segment_ids`, only those segments are considered, so a narrow
+        filter scores fewer rows rather than more.
+        """
+        query = np.asarray(query_vector, dtype=np.float32).ravel()
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        with self._lock:
+            vectors, ids = self._vectors, self._ids
+            if vectors is None or not len(ids):
+                return []
+            rows = self._candidate_rows(query)
+
+        if segment_ids is not None:
+            allowed = np.flatnonzero(np.isin(ids, np.asarray(segment_ids, dtype=np.int64)))
+            # Score a small filtered set exactly; intersect a large one with the probed lists
+            rows = allowed if rows is None or len(allowed) <= len(rows) else np.intersect1d(rows, allowed)
+
+        if rows is None:
+            scores = vectors @ query
+            row_ids = ids
+        else:
+            rows = np.sort(rows)  # sequential reads from the memory map
+            scores = vectors[rows] @ query
+            row_ids = ids[rows]
+        scores[row_ids < 0] = -np.inf
+        if not len(scores):
+            return []
+
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(row_ids[i]), float(scores[i])) for i in top if row_ids[i] >= 0]
+
+def spherical_kmeans(vectors: np.ndarray, k: int, iterations: int = IVF_TRAIN_ITERATIONS, seed: int = 0) -> np.ndarray:
+    """Cluster unit vectors by cosine similarity. Returns k unit centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        empty = ~sums.any(axis=1)
+        if empty.any():
+            # Re-seed empty clusters from random points
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids.astype(np.float32)
+
+class IVFIndex(VectorIndex):
+    """
+    Inverted-file ANN index over the same on-disk matrix.
+
+    Rows are clustered with spherical k-means into ~4*sqrt(N) lists; a query
+    only scores the rows of its `nprobe` closest lists. Inserts are assigned
+    to their nearest centroid as they arrive, deletes are tombstones, and the
+    clustering is retrained once the index outgrows it. Until there are
+    enough rows to train on, search is exact.
+
+    Extra files: lists.i32 (list number per row, -1 if untrained) and
+    centroids.f32.
+    """
+
+    backend = "ivf"
+    ROW_FIELDS = {**VectorIndex.ROW_FIELDS, "lists": np.int32}
+
+    def __init__(self, directory: str, nprobe: int = IVF_NPROBE, min_train_rows: int = IVF_MIN_TRAIN_ROWS):
+        self.nprobe = nprobe
+        self.min_train_rows = min_train_rows
+        self._centroids: Optional[np.ndarray] = None
+        self._list_rows: List[np.ndarray] = []
+        super().__init__(directory)
+
+    @property
+    def _centroids_path(self) -> Path:
+        return self.directory / "centroids.f32"
+
+    def _load(self):
+        super()._load()
+        self._centroids = None
+        if self._centroids_path.exists() and self.dim and self._meta.get("trained_rows"):
+            self._centroids = np.fromfile(self._centroids_path, dtype=np.float32).reshape(-1, self.dim)
+        if self._centroids is not None and np.any(self._rows["lists"] < 0):
+            self._assign_all()
+        elif self._centroids is None and len(self) >= self.min_train_rows:
+            self.train()
+        self._build_lists()
+
+    def reset(self, model_name: str, dim: int):
+        with self._lock:
+            self._centroids = None
+            self._list_rows = []
+            if self._centroids_path.exists():
+                self._centroids_path.unlink()
+            super().reset(model_name, dim)
+
+    def _nearest_list(self, vectors: np.ndarray) -> np.ndarray:
+        assign = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), 65536):
+            block = np.asarray(vectors[start:start + 65536])
+            assign[start:start + len(block)] = np.argmax(block @ self._centroids.T, axis=1)
+        return assign
+
+    def _extra_fields(self, vectors: np.ndarray) -> Dict[str, np.ndarray]:
+        if self._centroids is None:
+            return {"lists": np.full(len(vectors), -1, dtype=np.int32)}
+        return {"lists": self._nearest_list(vectors)}
+
+    def _build_lists(self):
+        """Group row numbers by list so a probe is a concatenation, not a scan."""
+        if self._centroids is None:
+            self._list_rows = []
+            return
+        lists = self._rows["lists"]
+        order = np.argsort(lists, kind="stable")
+        bounds = np.searchsorted(lists[order], np.arange(len(self._centroids) + 1))
+        self._list_rows = [order[bounds[i]:bounds[i + 1]] for i in range(len(self._centroids))]
+
+    def _after_add(self, added: int):
+        trained = self._meta.get("trained_rows", 0)
+        live = len(self)
+        if (not trained and live >= self.min_train_rows) or (trained and live >= IVF_RETRAIN_FACTOR * trained):
+            self.train()
+        elif self._centroids is not None:
+            first = len(self._ids) - added
+            new_lists = self._rows["lists"][first:]
+            for list_no in np.unique(new_lists):
+                rows = first + np.flatnonzero(new_lists == list_no)
+                self._list_rows[list_no] = np.concatenate([self._list_rows[list_no], rows])
+
+    def _compact(self):
+        super()._compact()
+        self._build_lists()
+
+    def _assign_all(self):
+        self._rows["lists"] = self._nearest_list(self._vectors)
+        tmp = self._field_path("lists").with_suffix(".tmp")
+        self._rows["lists"].tofile(tmp)
+        os.replace(tmp, self._field_path("lists"))
+
+    def train(self):
+        """(Re)cluster the live rows and reassign every row to a list."""
+        with self._lock:
+            live = np.flatnonzero(self._ids >= 0)
+            if self._vectors is None or len(live) < 2:
+                return
+            nlist = max(1, min(len(live), int(4 * np.sqrt(len(live)))))
+            rng = np.random.default_rng(0)
+            sample = live if len(live) <= IVF_TRAIN_SAMPLE else np.sort(rng.choice(live, IVF_TRAIN_SAMPLE, replace=False))
+            logger.info(f"Training IVF search index: {len(live)} rows into {nlist} lists")
+            self._centroids = spherical_kmeans(np.asarray(self._vectors[sample]), nlist)
+
+            tmp = self._centroids_path.with_suffix(".tmp")
+            self._centroids.tofile(tmp)
+            os.replace(tmp, self._centroids_path)
+            self._assign_all()
+            self._meta["trained_rows"] = len(live)
+            self._save_meta()
+            self._build_lists()
+
+    def _candidate_rows(self, query: np.ndarray) -> Optional[np.ndarray]:
+        if self._centroids is None:
+            return None
+        nprobe = min(self.nprobe, len(self._centroids))
+        closest = np.argpartition(-(self._centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self._list_rows[i] for i in closest])
+
+BACKENDS = {
+    VectorIndex.backend: VectorIndex,
+    IVFIndex.backend: IVFIndex,
+}
+
+def open_index(directory: str, backend: str = "flat") -> VectorIndex:
+    """Open (or create) the index in `directory` with the given backend."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown search index backend '{backend}'. Available: {', '.join(BACKENDS)}")
+    return BACKENDS[backend](directory)
@@ -0,0 +1,63 @@
+# backend/services/zip_stream.py
+# Build a ZIP archive incrementally and hand out its bytes as they are produced,
+# so an archive can be streamed to a client without a temp file or holding it in memory.
+
+import time
+import zipfile
+from typing import Iterable, Iterator, Optional, Tuple
+
+class _Sink:
+    """
+    Write-only, non-seekable file object for ZipFile. Everything written
+    since the last drain() is kept until then. Having no tell()/seek() makes
+    zipfile write sizes and CRCs in data descriptors after each entry.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+class ZipStream:
+    """
+    Usage:
+        archive = ZipStream()
+        for name, chunks in files:
+            yield from archive.add(name, chunks)
+        yield from archive.close()
+    """
+
+    def __init__(self, compression: int = zipfile.ZIP_DEFLATED):
+        self._sink = _Sink()
+        self._zip = zipfile.ZipFile(self._sink, mode="w", compression=compression)
+
+    def add(self, name: str, chunks: Iterable[bytes], date_time: Optional[Tuple[int, ...]] = None) -> Iterator[bytes]:
+        """Add one file from an iterable of byte chunks, yielding archive bytes as they are ready."""
+        info = zipfile.ZipInfo(name, date_time=date_time or time.localtime()[:6])
+        info.compress_type = self._zip.compression
+        with self._zip.open(info, mode="w") as entry:
+            for chunk in chunks:
+                entry.write(chunk)
+                data = self._sink.drain()
+                if data:
+                    yield data
+        data = self._sink.drain()
+        if data:
+            yield data
+
+    def close(self) -> Iterator[bytes]:
+        """Finish the archive (central directory)."""
+        self._zip.close()
+        data = self._sink.drain()
+        if data:
+            yield data
@@ -4,7 +4,7 @@ from services.downloader import download_audio
 async def test():
     print("Testing download...")
     try:
-        result = await download_audio("https://www.youtube.com/watch?v=jNQXAC9IVRw", 999)
+        result = await download_audio("https://www.youtube.com/watch?v=jNQXAC9IVRw")
         print("Download result:", result)
     except Exception as e:
         print("Download failed:", e)
@@ -0,0 +1,68 @@
+import requests
+import time
+import sys
+
+# Start the server with the local stand-in voice so no TTS service is needed:
+#   TTS_BACKEND=tone uvicorn main:app
+# then: python test_dub.py [project_id]
+BASE = 'http://localhost:8000'
+
+print("=" * 60)
+print("TESTING DUBBING")
+print("=" * 60)
+
+# Pick a project with a transcript
+if len(sys.argv) > 1:
+    project_id = int(sys.argv[1])
+else:
+    projects = [p for p in requests.get(f'{BASE}/projects').json() if p['status'] == 'completed']
+    if not projects:
+        print("❌ No completed project to dub. Transcribe something first.")
+        sys.exit(1)
+    project_id = projects[0]['id']
+print(f"Project {project_id}")
+
+# Test 1: Streamed continuous dub
+print("\n[1] Streaming continuous dub...")
+try:
+    t0 = time.time()
+    first_byte = None
+    size = 0
+    with requests.post(
+        f'{BASE}/projects/{project_id}/dub',
+        params={'aligned': 'false', 'stream': 'true'},
+        stream=True,
+    ) as r:
+        print(f"✅ Status: {r.status_code} ({r.headers.get('content-type')})")
+        for chunk in r.iter_content(chunk_size=None):
+            if first_byte is None:
+                first_byte = time.time() - t0
+            size += len(chunk)
+    total = time.time() - t0
+    print(f"   First audio after {first_byte:.2f}s, {size} bytes in {total:.2f}s")
+    assert size > 0, "empty stream"
+    assert first_byte is not None and first_byte <= total
+except Exception as e:
+    print(f"❌ Error: {e}")
+
+# Test 2: The streamed dub was saved for download
+print("\n[2] Downloading the saved dub...")
+try:
+    r = requests.get(f'{BASE}/projects/{project_id}/dub/download')
+    print(f"✅ Status: {r.status_code}, {len(r.content)} bytes")
+    assert r.status_code == 200 and len(r.content) == size, "download differs from the stream"
+except Exception as e:
+    print(f"❌ Error: {e}")
+
+# Test 3: Non-streamed dubs (continuous, then aligned to the timestamps)
+for aligned in ('false', 'true'):
+    print(f"\n[3] Generating dub (aligned={aligned})...")
+    try:
+        t0 = time.time()
+        r = requests.post(f'{BASE}/projects/{project_id}/dub', params={'aligned': aligned})
+        print(f"✅ Status: {r.status_code} in {time.time() - t0:.2f}s")
+        print(f"   Response: {r.json()}")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+print("\n" + "=" * 60)
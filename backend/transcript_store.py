@@ -0,0 +1,396 @@
+# Transcript segment storage
+# Segments are stored one row per segment in the `segments` table, ordered by
+# position and indexed on (transcript_id, start), instead of a str()'d Python
+# list in transcripts.content that had to be parsed back with ast.literal_eval.
+import ast
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import select, update, insert, delete, bindparam, text, table, column, literal_column
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal
+from models import (
+    Project, Transcript, Segment, TranscriptionCacheEntry, DiarizationCacheEntry, TranslationMemoryEntry,
+)
+from services import search_service
+from services.export_cache import export_cache
+from services.transcript_cache import transcript_cache
+
+logger = logging.getLogger(__name__)
+
+def segment_row(transcript_id: int, position: int, seg: dict) -> dict:
+    """Column values for one segment dict."""
+    return {
+        "transcript_id": transcript_id,
+        "position": position,
+        "start": float(seg.get("start", 0) or 0),
+        "end": float(seg.get("end", 0) or 0),
+        "text": seg.get("text", ""),
+        "speaker": seg.get("speaker") or None,
+    }
+
+async def save_segments(db: AsyncSession, transcript_id: int, segments: list, first_position: int = 0):
+    """Bulk insert segments for a transcript. The caller commits."""
+    if not segments:
+        return
+    rows = [segment_row(transcript_id, first_position + i, seg) for i, seg in enumerate(segments)]
+    await db.execute(insert(Segment), rows)
+
+async def delete_segments(db: AsyncSession, transcript_id: int):
+    await db.execute(delete(Segment).where(Segment.transcript_id == transcript_id))
+
+async def delete_transcript(db: AsyncSession, transcript_id: int):
+    """Delete a transcript and its segments. The caller commits."""
+    result = await db.execute(select(Segment.id).where(Segment.transcript_id == transcript_id))
+    segment_ids = [segment_id for (segment_id,) in result.all()]
+    # Removal can compact (rewrite) the index; keep it off the event loop
+    await asyncio.get_event_loop().run_in_executor(None, search_service.remove_from_index, segment_ids)
+    await delete_segments(db, transcript_id)
+    await db.execute(delete(Transcript).where(Transcript.id == transcript_id))
+    transcript_cache.invalidate(transcript_id)
+    export_cache.invalidate(transcript_id)
+
+async def load_segments(db: AsyncSession, transcript_id: int, from_position: int = 0) -> List[dict]:
+    """Load a transcript's segments as plain dicts, in order."""
+    result = await db.execute(
+        select(Segment.start, Segment.end, Segment.text, Segment.speaker)
+        .where(Segment.transcript_id == transcript_id, Segment.position >= from_position)
+        .order_by(Segment.position)
+    )
+    segments = []
+    for start, end, text, speaker in result.all():
+        seg = {"start": start, "end": end, "text": text}
+        if speaker:
+            seg["speaker"] = speaker
+        segments.append(seg)
+    return segments
+
+async def get_segments(db: AsyncSession, transcript: Transcript) -> List[dict]:
+    """
+    Segments for a transcript, served from the shared LRU cache when the
+    cached copy matches the transcript's version. Treat the list as read-only.
+    """
+    version = transcript.version or 1
+    segments = transcript_cache.get(transcript.id, version)
+    if segments is None:
+        segments = await load_segments(db, transcript.id)
+        transcript_cache.put(transcript.id, version, segments)
+    return segments
+
+async def touch_transcript(db: AsyncSession, transcript_id: int):
+    """Bump a transcript's version after its segments change and drop the cached copy."""
+    await db.execute(
+        update(Transcript)
+        .where(Transcript.id == transcript_id)
+        .values(version=Transcript.version + 1, updated_at=datetime.utcnow())
+    )
+    transcript_cache.invalidate(transcript_id)
+
+async def set_speakers(db: AsyncSession, transcript_id: int, segments: list):
+    """Write speaker labels back by position, keeping segment rows (and ids) intact."""
+    rows = [
+        {"b_transcript_id": transcript_id, "b_position": i, "b_speaker": seg.get("speaker") or None}
+        for i, seg in enumerate(segments)
+    ]
+    if not rows:
+        return
+    stmt = (
+        update(Segment.__table__)
+        .where(
+            Segment.__table__.c.transcript_id == bindparam("b_transcript_id"),
+            Segment.__table__.c.position == bindparam("b_position"),
+        )
+        .values(speaker=bindparam("b_speaker"))
+    )
+    await db.execute(stmt, rows)
+    await touch_transcript(db, transcript_id)
+
+async def embed_transcript(db: AsyncSession, transcript: Transcript) -> Optional[int]:
+    """
+    Add a finished transcript's segments to the search index and mark it
+    indexed. Returns None (leaving it unindexed) without an embedding model.
+    """
+    result = await db.execute(
+        select(Segment.id, Segment.text).where(Segment.transcript_id == transcript.id).order_by(Segment.position)
+    )
+    segments = [{"id": segment_id, "text": text} for segment_id, text in result.all()]
+    loop = asyncio.get_event_loop()
+    count = await loop.run_in_executor(None, search_service.index_transcript, transcript.project_id, segments)
+    if count is not None:
+        await db.execute(update(Transcript).where(Transcript.id == transcript.id).values(is_indexed=True))
+        await db.commit()
+    return count
+
+async def backfill_search_index() -> int:
+    """Index complete transcripts that predate the search index (or its current model)."""
+    indexed = 0
+    async with AsyncSessionLocal() as db:
+        if not search_service.index_matches_model():
+            await db.execute(update(Transcript).values(is_indexed=False))
+            await db.commit()
+        result = await db.execute(
+            select(Transcript).where(
+                Transcript.is_complete.is_(True),
+                Transcript.is_indexed.is_not(True),
+                Transcript.source_transcript_id.is_(None),
+            )
+        )
+        for transcript in result.scalars().all():
+            if await embed_transcript(db, transcript) is None:
+                break
+            indexed += 1
+
+    if indexed:
+        logger.info(f"[INDEX] Indexed {indexed} existing transcripts for search")
+    return indexed
+
+async def load_search_hits(db: AsyncSession, hits: list) -> List[dict]:
+    """Turn (segment_id, score) pairs into search results, in hit order."""
+    if not hits:
+        return []
+    result = await db.execute(
+        select(
+            Segment.id, Segment.position, Segment.start, Segment.end, Segment.text, Segment.speaker,
+            Project.id, Project.title,
+        )
+        .join(Transcript, Segment.transcript_id == Transcript.id)
+        .join(Project, Transcript.project_id == Project.id)
+        .where(Segment.id.in_([segment_id for segment_id, _ in hits]))
+    )
+    rows = {row[0]: row for row in result.all()}
+
+    results = []
+    for segment_id, score in hits:
+        row = rows.get(segment_id)
+        if row is None:
+            continue  # deleted since it was indexed
+        _, position, start, end, text, speaker, project_id, title = row
+        hit = {
+            'id': f"{project_id}_{position}",
+            'segment_id': segment_id,
+            'project_id': project_id,
+            'title': title or f"Project {project_id}",
+            'segment_index': position,
+            'text': text,
+            'start': start,
+            'end': end,
+            'score': score,
+        }
+        if speaker:
+            hit['speaker'] = speaker
+        results.append(hit)
+    return results
+
+def search_filter_clauses(
+    project_id: int = None,
+    language: str = None,
+    speaker: str = None,
+    created_after: datetime = None,
+    created_before: datetime = None,
+    start_time: float = None,
+    end_time: float = None,
+) -> list:
+    """
+    WHERE clauses narrowing a search, over Segment joined to Transcript and
+    Project. start_time/end_time keep segments overlapping that window of
+    the video; created_after/before apply to when the project was added.
+    """
+    clauses = [Transcript.is_complete.is_(True), Transcript.source_transcript_id.is_(None)]
+    if project_id is not None:
+        clauses.append(Transcript.project_id == project_id)
+    if language:
+        clauses.append(Transcript.language == language)
+    if speaker:
+        clauses.append(Segment.speaker == speaker)
+    if created_after:
+        clauses.append(Project.created_at >= created_after)
+    if created_before:
+        clauses.append(Project.created_at < created_before)
+    if start_time is not None:
+        clauses.append(Segment.end > start_time)
+    if end_time is not None:
+        clauses.append(Segment.start < end_time)
+    return clauses
+
+def _with_search_joins(query):
+    return (
+        query.join(Transcript, Transcript.id == Segment.transcript_id)
+        .join(Project, Project.id == Transcript.project_id)
+    )
+
+async def filtered_segment_ids(db: AsyncSession, clauses: list) -> List[int]:
+    """Ids of every segment passing the filters, to restrict vector search to."""
+    result = await db.execute(_with_search_joins(select(Segment.id)).where(*clauses))
+    return [segment_id for (segment_id,) in result.all()]
+
+async def load_filtered_segments(db: AsyncSession, clauses: list) -> List[dict]:
+    """Every segment passing the filters as {'id', 'text', 'title'}, for scanning without an index."""
+    result = await db.execute(
+        _with_search_joins(select(Segment.id, Segment.text, Project.id, Project.title)).where(*clauses)
+    )
+    return [
+        {'id': segment_id, 'text': seg_text, 'title': title or f"Project {project_id}"}
+        for segment_id, seg_text, project_id, title in result.all()
+    ]
+
+_segments_fts = table("segments_fts", column("rowid"))
+
+async def keyword_search_hits(db: AsyncSession, query: str, limit: int = 10, clauses: list = None) -> List[tuple]:
+    """
+    (segment_id, score) pairs from the segments_fts index, best first, with
+    filters applied inside the same query. Supports "phrases" and prefix*.
+    """
+    match = search_service.fts_query(query)
+    if not match:
+        return []
+    rank = literal_column("bm25(segments_fts)")
+    stmt = _with_search_joins(
+        select(Segment.id, rank).select_from(_segments_fts.join(Segment, Segment.id == _segments_fts.c.rowid))
+    ).where(
+        text("segments_fts MATCH :match").bindparams(match=match),
+        *(clauses if clauses is not None else search_filter_clauses()),
+    ).order_by(rank).limit(limit)
+    result = await db.execute(stmt)
+    return [(segment_id, -score) for segment_id, score in result.all()]  # bm25() is lower-is-better
+
+def transcription_cache_key(audio_sha256: str, model_size: str, compute_type: str, beam_size: int, language: str = None) -> dict:
+    """Everything that changes Whisper's output for a given audio file."""
+    return {
+        "audio_sha256": audio_sha256,
+        "model_size": model_size,
+        "compute_type": compute_type,
+        "beam_size": beam_size,
+        "language": language or "auto",
+    }
+
+async def get_cached_transcription(db: AsyncSession, key: dict) -> Optional[dict]:
+    """A stored transcribe() result for this audio and settings, if any."""
+    result = await db.execute(
+        select(TranscriptionCacheEntry).where(
+            *(getattr(TranscriptionCacheEntry, column) == value for column, value in key.items())
+        )
+    )
+    entry = result.scalar_one_or_none()
+    if entry is None:
+        return None
+    return {
+        "language": entry.detected_language,
+        "language_probability": entry.language_probability,
+        "duration": entry.duration,
+        "segments": json.loads(entry.segments),
+    }
+
+async def store_cached_transcription(db: AsyncSession, key: dict, info: dict, segments: list):
+    """Save (or replace) a transcribe() result. The caller commits."""
+    await db.execute(
+        delete(TranscriptionCacheEntry).where(
+            *(getattr(TranscriptionCacheEntry, column) == value for column, value in key.items())
+        )
+    )
+    db.add(TranscriptionCacheEntry(
+        **key,
+        detected_language=info.get("language"),
+        language_probability=info.get("language_probability"),
+        duration=info.get("duration"),
+        segments=json.dumps(
+            [{"start": s["start"], "end": s["end"], "text": s["text"]} for s in segments],
+            separators=(",", ":"),
+        ),
+    ))
+
+async def get_cached_diarization(db: AsyncSession, audio_sha256: str) -> Optional[list]:
+    """Speaker turns found earlier for this audio, if any."""
+    result = await db.execute(
+        select(DiarizationCacheEntry.turns).where(DiarizationCacheEntry.audio_sha256 == audio_sha256)
+    )
+    turns = result.scalar_one_or_none()
+    return json.loads(turns) if turns is not None else None
+
+async def store_cached_diarization(db: AsyncSession, audio_sha256: str, turns: list):
+    """Save (or replace) the speaker turns of an audio file. The caller commits."""
+    await db.execute(delete(DiarizationCacheEntry).where(DiarizationCacheEntry.audio_sha256 == audio_sha256))
+    db.add(DiarizationCacheEntry(
+        audio_sha256=audio_sha256,
+        turns=json.dumps(
+            [{"start": t["start"], "end": t["end"], "speaker": t["speaker"]} for t in turns],
+            separators=(",", ":"),
+        ),
+    ))
+
+# Keep IN (...) lists under SQLite's bound-parameter limit
+_LOOKUP_CHUNK = 500
+
+async def get_translation_memory(db: AsyncSession, hashes: list, source_lang: str, target_lang: str, model_version: str) -> dict:
+    """Known translations of the given source text hashes, as {hash: text}."""
+    memory = {}
+    hashes = list(set(hashes))
+    for start in range(0, len(hashes), _LOOKUP_CHUNK):
+        result = await db.execute(
+            select(TranslationMemoryEntry.source_hash, TranslationMemoryEntry.target_text).where(
+                TranslationMemoryEntry.source_hash.in_(hashes[start:start + _LOOKUP_CHUNK]),
+                TranslationMemoryEntry.source_lang == source_lang,
+                TranslationMemoryEntry.target_lang == target_lang,
+                TranslationMemoryEntry.model_version == model_version,
+            )
+        )
+        memory.update(result.all())
+    return memory
+
+async def store_translation_memory(db: AsyncSession, entries: list, source_lang: str, target_lang: str, model_version: str):
+    """Add (source_hash, source_text, target_text) entries. The caller commits."""
+    if not entries:
+        return
+    await db.execute(
+        insert(TranslationMemoryEntry).prefix_with("OR IGNORE"),
+        [
+            {
+                "source_hash": source_hash,
+                "source_lang": source_lang,
+                "target_lang": target_lang,
+                "model_version": model_version,
+                "source_text": source_text,
+                "target_text": target_text,
+            }
+            for source_hash, source_text, target_text in entries
+        ],
+    )
+
+def parse_legacy_content(content: str) -> Optional[list]:
+    """Parse the old str()'d (or JSON) segment list. Returns None if unreadable."""
+    for parse in (ast.literal_eval, json.loads):
+        try:
+            segments = parse(content)
+        except Exception:
+            continue
+        if isinstance(segments, list):
+            return segments
+    return None
+
+async def migrate_legacy_transcripts() -> int:
+    """
+    Move segments from transcripts.content into the segments table.
+    Runs once per row: migrated rows get content cleared.
+    """
+    migrated = 0
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Transcript.id, Transcript.content).where(Transcript.content.is_not(None)))
+        for transcript_id, content in result.all():
+            segments = parse_legacy_content(content)
+            if segments is None:
+                logger.warning(f"[MIGRATE] Could not parse transcript {transcript_id}, leaving as is")
+                continue
+
+            await delete_segments(db, transcript_id)
+            await save_segments(db, transcript_id, segments)
+            await db.execute(update(Transcript).where(Transcript.id == transcript_id).values(content=None))
+            await touch_transcript(db, transcript_id)
+            await db.commit()
+            migrated += 1
+
+    if migrated:
+        logger.info(f"[MIGRATE] Moved {migrated} transcripts into the segments table")
+    return migrated